@@ -0,0 +1,163 @@
+import argparse
+from datetime import datetime, timedelta, timezone
+import os
+from uuid import uuid4
+
+from backend.main import (
+    ARCHIVE_AFTER_DAYS,
+    ARCHIVE_DIR,
+    ARCHIVE_TABLES,
+    JSONB_COLUMNS,
+    _execute_batch,
+    _json_dump,
+    _session_payload_text,
+    _write_archive,
+    close_pool,
+    create_schema,
+    get_conn,
+)
+
+# Moves sessions created more than --older-than-days ago to the cold archive: the payload and the
+# ARCHIVE_TABLES rows are written to Parquet (one file per table, month and batch), then removed
+# from Postgres in the same transaction that records the files in archived_sessions. Sessions
+# being written concurrently are skipped (SKIP LOCKED) and picked up by a later run.
+# Each run first removes archive files that no archived_sessions row points to (sessions that were
+# stored again, or batches whose transaction never committed); runs are serialized by a lock so
+# that never races with a batch being written.
+
+ARCHIVE_CANDIDATES_SQL = """
+    SELECT session_id, created_at, payload::text AS payload, payload_codec, payload_blob, payload_dict_id
+    FROM sessions
+    WHERE created_at < %s AND payload_codec IS DISTINCT FROM 'archive'
+    ORDER BY session_id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+ARCHIVE_ORDER = {
+    "mechanic_events": "event_id",
+    "process_logs": "process_log_id",
+    "player_actions_log": "player_action_id",
+}
+
+
+def _archive_rows(conn, table: str, session_ids: list) -> list:
+    rows = conn.execute(
+        f"SELECT * FROM {table} WHERE session_id = ANY(%s) ORDER BY session_id, {ARCHIVE_ORDER[table]}",
+        (session_ids,),
+    ).fetchall()
+    jsonb_columns = JSONB_COLUMNS.get(table, ())
+    return [
+        {k: _json_dump(v) if k in jsonb_columns else v for k, v in row.items() if k != "row_hash"}
+        for row in rows
+    ]
+
+
+def archive_batch(conn, cutoff: str, batch_size: int) -> int:
+    sessions = conn.execute(ARCHIVE_CANDIDATES_SQL, (cutoff, batch_size)).fetchall()
+    if not sessions:
+        return 0
+    archived_at = datetime.now(timezone.utc).isoformat()
+    by_month = {}
+    for row in sessions:
+        by_month.setdefault(row["created_at"][:7], []).append(row)
+
+    for month, rows in by_month.items():
+        archive = {"month": month, "file_name": f"{uuid4().hex}.parquet"}
+        session_ids = [row["session_id"] for row in rows]
+        _write_archive("sessions", archive, [{"session_id": row["session_id"], "payload": _session_payload_text(conn, row)} for row in rows])
+        for table in ARCHIVE_TABLES:
+            _write_archive(table, archive, _archive_rows(conn, table, session_ids))
+        _execute_batch(
+            conn,
+            """
+            INSERT INTO archived_sessions (session_id, month, file_name, archived_at)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (session_id) DO UPDATE SET
+                month = EXCLUDED.month,
+                file_name = EXCLUDED.file_name,
+                archived_at = EXCLUDED.archived_at
+            """,
+            [(session_id, month, archive["file_name"], archived_at) for session_id in session_ids],
+        )
+
+    session_ids = [row["session_id"] for row in sessions]
+    for table in ARCHIVE_TABLES:
+        conn.execute(f"DELETE FROM {table} WHERE session_id = ANY(%s)", (session_ids,))
+    # The hot tables are empty now: the next store of the session must rewrite them, not skip them
+    conn.execute(
+        "DELETE FROM session_sync_state WHERE session_id = ANY(%s) AND table_name = ANY(%s)",
+        (session_ids, list(ARCHIVE_TABLES)),
+    )
+    conn.execute(
+        """
+        UPDATE sessions
+        SET payload = NULL, payload_codec = 'archive', payload_blob = NULL, payload_dict_id = NULL,
+            revision = nextval('session_revision_seq')
+        WHERE session_id = ANY(%s)
+        """,
+        (session_ids,),
+    )
+    conn.commit()
+    return len(sessions)
+
+
+def remove_unreferenced_archives(conn) -> int:
+    referenced = {
+        (row["month"], row["file_name"])
+        for row in conn.execute("SELECT DISTINCT month, file_name FROM archived_sessions").fetchall()
+    }
+    conn.commit()
+    removed = 0
+    for table in ("sessions",) + ARCHIVE_TABLES:
+        for path in (ARCHIVE_DIR / table).glob("month=*/*.parquet*"):
+            month = path.parent.name.removeprefix("month=")
+            if path.name.startswith(".") or (month, path.name) not in referenced:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def archive_sessions(older_than_days: int, batch_size: int) -> int | None:
+    # None: another run holds the lock
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).isoformat()
+    archived = 0
+    with get_conn() as conn:
+        create_schema(conn)
+        if not conn.execute("SELECT pg_try_advisory_lock(hashtext('archive_sessions')) AS locked").fetchone()["locked"]:
+            return None
+        try:
+            removed = remove_unreferenced_archives(conn)
+            if removed:
+                print(f"  {removed} unreferenced archive file(s) removed", flush=True)
+            while True:
+                count = archive_batch(conn, cutoff, batch_size)
+                if not count:
+                    break
+                archived += count
+                print(f"  {archived} session(s) archived", flush=True)
+        finally:
+            conn.rollback()
+            conn.execute("SELECT pg_advisory_unlock(hashtext('archive_sessions'))")
+            conn.commit()
+    return archived
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Move old sessions' payloads and logs to Parquet files on local disk.")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS, help="Archive sessions created more than N days ago")
+    parser.add_argument("--batch-size", type=int, default=100, help="Sessions archived per transaction")
+    args = parser.parse_args()
+    try:
+        archived = archive_sessions(args.older_than_days, max(1, args.batch_size))
+        if archived is None:
+            print("Another archive run is in progress.")
+            return 1
+        print(f"Archived {archived} session(s).")
+        return 0
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
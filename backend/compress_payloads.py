@@ -0,0 +1,112 @@
+import argparse
+from datetime import datetime, timezone
+
+import zstandard
+
+from backend.main import (
+    _encode_session_payload,
+    _session_payload_text,
+    close_pool,
+    create_schema,
+    get_conn,
+)
+
+# One-off rewrite of sessions.payload into the configured storage: trains a zstd dictionary on a
+# sample of stored exports, then re-encodes every session whose codec/dictionary differs. Rows
+# written concurrently (newer revision) are left alone; the API already stored them correctly.
+# Archived sessions (see archive_sessions.py) are not in Postgres and are skipped.
+
+PAYLOAD_SOURCE_COLUMNS = "session_id, revision, payload::text AS payload, payload_codec, payload_blob, payload_dict_id"
+
+
+def train_dictionary(conn, samples: int, dict_size: int) -> int | None:
+    rows = conn.execute(
+        f"SELECT {PAYLOAD_SOURCE_COLUMNS} FROM sessions WHERE payload_codec IS DISTINCT FROM 'archive' ORDER BY random() LIMIT %s",
+        (samples,),
+    ).fetchall()
+    if not rows:
+        return None
+    data = [_session_payload_text(conn, row).encode("utf-8") for row in rows]
+    dictionary = zstandard.train_dictionary(dict_size, data)
+    dict_id = conn.execute(
+        """
+        INSERT INTO payload_dictionaries (dictionary, sample_count, created_at)
+        VALUES (%s, %s, %s) RETURNING dict_id
+        """,
+        (dictionary.as_bytes(), len(data), datetime.now(timezone.utc).isoformat()),
+    ).fetchone()["dict_id"]
+    conn.commit()
+    return dict_id
+
+
+def rewrite_payloads(conn, codec: str, batch_size: int) -> tuple[int, int, int]:
+    dict_id = conn.execute("SELECT max(dict_id) AS dict_id FROM payload_dictionaries").fetchone()["dict_id"]
+    last_session_id, rewritten, before, after = None, 0, 0, 0
+    while True:
+        rows = conn.execute(
+            f"""
+            SELECT {PAYLOAD_SOURCE_COLUMNS} FROM sessions
+            WHERE (%(last_session_id)s::text IS NULL OR session_id > %(last_session_id)s)
+              AND payload_codec IS DISTINCT FROM 'archive'
+              AND CASE WHEN %(codec)s = 'zstd'
+                       THEN payload_codec IS DISTINCT FROM 'zstd' OR payload_dict_id IS DISTINCT FROM %(dict_id)s
+                       ELSE payload_codec IS NOT NULL END
+            ORDER BY session_id
+            LIMIT %(batch_size)s
+            """,
+            {"last_session_id": last_session_id, "codec": codec, "dict_id": dict_id, "batch_size": batch_size},
+        ).fetchall()
+        if not rows:
+            return rewritten, before, after
+        for row in rows:
+            text = _session_payload_text(conn, row)
+            payload, payload_codec, payload_blob, payload_dict_id = _encode_session_payload(conn, text, codec)
+            # Back to JSONB, Postgres re-renders the text: bump the revision so cached bodies/ETags drop
+            cur = conn.execute(
+                """
+                UPDATE sessions
+                SET payload = %s, payload_codec = %s, payload_blob = %s, payload_dict_id = %s,
+                    revision = CASE WHEN %s THEN nextval('session_revision_seq') ELSE revision END
+                WHERE session_id = %s AND revision = %s
+                """,
+                (payload, payload_codec, payload_blob, payload_dict_id, payload_codec is None, row["session_id"], row["revision"]),
+            )
+            if cur.rowcount:
+                rewritten += 1
+                before += len(row["payload_blob"]) if row["payload_blob"] is not None else len(row["payload"].encode("utf-8"))
+                after += len(payload_blob) if payload_blob is not None else len(text.encode("utf-8"))
+        conn.commit()
+        last_session_id = rows[-1]["session_id"]
+        print(f"  {rewritten} session(s) rewritten", flush=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Move stored session payloads to compressed (or back to JSONB) storage.")
+    parser.add_argument("--codec", choices=("zstd", "jsonb"), default="zstd", help="Target storage for sessions.payload")
+    parser.add_argument("--train", action="store_true", help="Train a new dictionary before rewriting")
+    parser.add_argument("--samples", type=int, default=2000, help="Sessions sampled to train the dictionary")
+    parser.add_argument("--dict-size", type=int, default=112640, help="Dictionary size in bytes")
+    parser.add_argument("--batch-size", type=int, default=200, help="Sessions committed per transaction")
+    args = parser.parse_args()
+    try:
+        with get_conn() as conn:
+            create_schema(conn)
+            if args.train and args.codec == "zstd":
+                try:
+                    dict_id = train_dictionary(conn, args.samples, args.dict_size)
+                except zstandard.ZstdError as exc:
+                    print(f"Could not train a dictionary ({exc}); add more sessions or lower --dict-size.")
+                    return 1
+                if dict_id is None:
+                    print("No sessions found to train a dictionary.")
+                    return 1
+                print(f"Trained dictionary {dict_id}.")
+            rewritten, before, after = rewrite_payloads(conn, args.codec, max(1, args.batch_size))
+        print(f"Rewrote {rewritten} session(s) as {args.codec}: {before} -> {after} bytes.")
+        return 0
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,17 +1,33 @@
-from datetime import datetime, timezone
-from copy import deepcopy
+import asyncio
+from bisect import bisect_left
+import gzip
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+import hashlib
 import json
+import logging
 import os
 from pathlib import Path
-from uuid import UUID
+import re
+import threading
+from uuid import UUID, uuid4
 
-import psycopg
+import anyio
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Body
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import FastAPI, HTTPException, Body, Header, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, ConnectionPool, PoolTimeout
+import zstandard
 
 BASE_DIR = Path(__file__).resolve().parent
+logger = logging.getLogger(__name__)
 load_dotenv(BASE_DIR / ".env.local")
 load_dotenv(BASE_DIR / ".env")
 
@@ -20,13 +36,114 @@ if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL is required. Set it to your Postgres connection string.")
 
 
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))
+DB_ASYNC_POOL_MAX_SIZE = int(os.getenv("DB_ASYNC_POOL_MAX_SIZE", str(DB_POOL_MAX_SIZE)))
+# Worker threads for the sync (CPU-bound normalization) endpoints; unset keeps anyio's default of 40
+THREADPOOL_SIZE = os.getenv("THREADPOOL_SIZE")
+
+_pool = None
+_pool_lock = threading.Lock()
+_async_pool = None
+_async_pool_lock = asyncio.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                DATABASE_URL,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=max(DB_POOL_MAX_SIZE, DB_POOL_MIN_SIZE),
+                timeout=DB_POOL_TIMEOUT,
+                max_idle=DB_POOL_MAX_IDLE,
+                max_lifetime=DB_POOL_MAX_LIFETIME,
+                kwargs={"row_factory": dict_row},
+                check=ConnectionPool.check_connection,
+                name="simulator",
+                open=False,
+            )
+            _pool.open()
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
 def get_conn():
-    conn = psycopg.connect(DATABASE_URL)
-    conn.row_factory = dict_row
-    return conn
+    # Pooled connection: commits on clean exit, rolls back on error and returns to the pool.
+    return get_pool().connection()
+
+
+async def get_async_pool():
+    global _async_pool
+    async with _async_pool_lock:
+        if _async_pool is None:
+            pool = AsyncConnectionPool(
+                DATABASE_URL,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=max(DB_ASYNC_POOL_MAX_SIZE, DB_POOL_MIN_SIZE),
+                timeout=DB_POOL_TIMEOUT,
+                max_idle=DB_POOL_MAX_IDLE,
+                max_lifetime=DB_POOL_MAX_LIFETIME,
+                kwargs={"row_factory": dict_row},
+                check=AsyncConnectionPool.check_connection,
+                name="simulator-async",
+                open=False,
+            )
+            await pool.open()
+            _async_pool = pool
+        return _async_pool
+
+
+async def close_async_pool():
+    global _async_pool
+    async with _async_pool_lock:
+        if _async_pool is not None:
+            await _async_pool.close()
+            _async_pool = None
+
+
+@asynccontextmanager
+async def get_async_conn():
+    # asyncio counterpart of get_conn() for the read endpoints: waiting for a connection does not hold a thread
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        yield conn
+
+
+JSONB_COLUMNS = {
+    "sessions": ("payload",),
+    "explicit_decisions": ("consequences",),
+    "expected_actions": ("constraints", "effects"),
+    "canonical_actions": ("value_final", "context"),
+    "mechanic_events": ("payload",),
+    "comparisons": ("deviation",),
+    "daily_effects": ("comparisons", "global_deltas", "stakeholder_deltas"),
+    "process_logs": ("events",),
+    "player_actions_log": ("metadata",),
+    "session_state": ("stakeholders", "global_state"),
+    "session_stakeholders": ("state",),
+    "reports": ("payload",),
+}
 
 
-def create_schema(conn):
+# ---- Schema migrations ----
+# Each step runs once per database, in order, and is recorded in schema_migrations. Steps are
+# idempotent (IF NOT EXISTS / guarded backfills) so databases set up before the runner existed can
+# replay them safely. New schema changes go in a new step appended to MIGRATIONS.
+
+
+def _migrate_base_schema(conn):
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS users (
@@ -116,7 +233,7 @@ def create_schema(conn):
             start_time TEXT,
             end_time TEXT,
             created_at TEXT NOT NULL,
-            payload TEXT NOT NULL,
+            payload JSONB NOT NULL,
             estado TEXT,
             navegador TEXT,
             FOREIGN KEY (user_id) REFERENCES users(user_id),
@@ -159,7 +276,7 @@ def create_schema(conn):
             stakeholder TEXT,
             day INTEGER,
             time_slot TEXT,
-            consequences TEXT,
+            consequences JSONB,
             FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
         )
         """
@@ -185,11 +302,11 @@ def create_schema(conn):
             source_option_id TEXT,
             action_type TEXT,
             target_ref TEXT,
-            constraints TEXT,
+            constraints JSONB,
             rule_id TEXT,
             created_at BIGINT,
             mechanic_id TEXT,
-            effects TEXT,
+            effects JSONB,
             FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
         )
         """
@@ -197,7 +314,7 @@ def create_schema(conn):
     conn.execute(
         """
         ALTER TABLE expected_actions
-        ADD COLUMN IF NOT EXISTS effects TEXT
+        ADD COLUMN IF NOT EXISTS effects JSONB
         """
     )
     conn.execute(
@@ -208,9 +325,9 @@ def create_schema(conn):
             mechanic_id TEXT,
             action_type TEXT,
             target_ref TEXT,
-            value_final TEXT,
+            value_final JSONB,
             committed_at BIGINT,
-            context TEXT,
+            context JSONB,
             FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
         )
         """
@@ -223,7 +340,7 @@ def create_schema(conn):
             mechanic_id TEXT,
             event_type TEXT,
             timestamp BIGINT,
-            payload TEXT,
+            payload JSONB,
             FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
         )
         """
@@ -236,7 +353,7 @@ def create_schema(conn):
             expected_action_id TEXT,
             canonical_action_id TEXT,
             outcome TEXT,
-            deviation TEXT,
+            deviation JSONB,
             rule_id TEXT,
             FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
         )
@@ -314,9 +431,9 @@ def create_schema(conn):
             effect_id BIGSERIAL PRIMARY KEY,
             session_id TEXT NOT NULL,
             day INTEGER NOT NULL,
-            comparisons TEXT,
-            global_deltas TEXT,
-            stakeholder_deltas TEXT,
+            comparisons JSONB,
+            global_deltas JSONB,
+            stakeholder_deltas JSONB,
             created_at TEXT NOT NULL,
             status TEXT,
             applied_at TEXT,
@@ -342,7 +459,7 @@ def create_schema(conn):
             end_time DOUBLE PRECISION,
             total_duration DOUBLE PRECISION,
             final_choice TEXT,
-            events TEXT,
+            events JSONB,
             FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
         )
         """
@@ -353,7 +470,7 @@ def create_schema(conn):
             player_action_id BIGSERIAL PRIMARY KEY,
             session_id TEXT NOT NULL,
             event TEXT,
-            metadata TEXT,
+            metadata JSONB,
             day INTEGER,
             time_slot TEXT,
             timestamp DOUBLE PRECISION,
@@ -365,8 +482,8 @@ def create_schema(conn):
         """
         CREATE TABLE IF NOT EXISTS session_state (
             session_id TEXT PRIMARY KEY,
-            stakeholders TEXT,
-            global_state TEXT,
+            stakeholders JSONB,
+            global_state JSONB,
             FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
         )
         """
@@ -376,7 +493,7 @@ def create_schema(conn):
         CREATE TABLE IF NOT EXISTS session_stakeholders (
             session_id TEXT NOT NULL,
             stakeholder_id TEXT NOT NULL,
-            state TEXT,
+            state JSONB,
             PRIMARY KEY (session_id, stakeholder_id),
             FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE,
             FOREIGN KEY (stakeholder_id) REFERENCES stakeholders(stakeholder_id)
@@ -388,7 +505,7 @@ def create_schema(conn):
         CREATE TABLE IF NOT EXISTS reports (
             report_id BIGSERIAL PRIMARY KEY,
             session_id TEXT NOT NULL,
-            payload TEXT,
+            payload JSONB,
             FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
         )
         """
@@ -406,7 +523,367 @@ def create_schema(conn):
     conn.execute("CREATE INDEX IF NOT EXISTS idx_decision_nodes_escenario ON decision_nodes(escenario_id)")
     conn.execute("CREATE INDEX IF NOT EXISTS idx_scenarios_version ON scenarios(version_id)")
     conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_effects_session_day ON daily_effects(session_id, day)")
-    conn.commit()
+
+
+def _migrate_incremental_sync(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS session_sync_state (
+            session_id TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            PRIMARY KEY (session_id, table_name),
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+        )
+        """
+    )
+    for table in SYNC_TABLES:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS row_hash TEXT")
+
+
+def _migrate_normalization_runs(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS normalization_runs (
+            run_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            session_id TEXT,
+            last_session_id TEXT,
+            processed INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            chunk_size INTEGER,
+            started_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            error TEXT
+        )
+        """
+    )
+    conn.execute(
+        """
+        ALTER TABLE normalization_runs
+        ADD COLUMN IF NOT EXISTS partition_index INTEGER,
+        ADD COLUMN IF NOT EXISTS partition_count INTEGER
+        """
+    )
+
+
+def _migrate_session_revision(conn):
+    # Bumped on every write that changes a session or its normalized rows; drives ETags and cache validation
+    conn.execute("CREATE SEQUENCE IF NOT EXISTS session_revision_seq")
+    conn.execute(
+        """
+        ALTER TABLE sessions
+        ADD COLUMN IF NOT EXISTS revision BIGINT NOT NULL DEFAULT nextval('session_revision_seq')
+        """
+    )
+
+
+def _strip_text_column_nul(conn, table: str, column: str):
+    # A single \u0000 left in a TEXT row would make the cast to JSONB abort the migration
+    is_text = conn.execute(
+        """
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s AND data_type = 'text'
+        """,
+        (table, column),
+    ).fetchone()
+    if not is_text:
+        return
+    rows = conn.execute(f"SELECT ctid, {column} AS value FROM {table} WHERE strpos({column}, %s) > 0", ("\\u0000",)).fetchall()
+    _execute_batch(
+        conn,
+        f"UPDATE {table} SET {column} = %s WHERE ctid = %s",
+        [(_strip_json_nul(r["value"]), r["ctid"]) for r in rows],
+    )
+
+
+def _migrate_jsonb_columns(conn):
+    # Databases created before the JSONB switch still hold these columns as TEXT
+    for table, columns in JSONB_COLUMNS.items():
+        for column in columns:
+            _strip_text_column_nul(conn, table, column)
+            conn.execute(
+                f"""
+                DO $$
+                BEGIN
+                    IF EXISTS (
+                        SELECT 1 FROM information_schema.columns
+                        WHERE table_schema = current_schema()
+                          AND table_name = '{table}' AND column_name = '{column}' AND data_type = 'text'
+                    ) THEN
+                        ALTER TABLE {table} ALTER COLUMN {column} TYPE JSONB USING {column}::jsonb;
+                    END IF;
+                END$$;
+                """
+            )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expected_constraints ON expected_actions USING GIN (constraints jsonb_path_ops)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expected_constraints_day ON expected_actions ((constraints->>'day'))")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expected_constraints_time_window ON expected_actions ((constraints->>'time_window'))")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_canonical_value_final ON canonical_actions USING GIN (value_final jsonb_path_ops)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_canonical_value_final_day ON canonical_actions ((value_final->>'day'))")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_canonical_value_final_time_slot ON canonical_actions ((value_final->>'time_slot'))")
+
+
+def _migrate_expected_day_index(conn):
+    # day_index: weekday (0-6) from constraints.day, NULL when the action applies to any day.
+    # Lets resolve_day_effects load only the rows for the requested day.
+    has_day_index = conn.execute(
+        """
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'expected_actions' AND column_name = 'day_index'
+        """
+    ).fetchone()
+    if not has_day_index:
+        conn.execute("ALTER TABLE expected_actions ADD COLUMN day_index SMALLINT")
+        rows = conn.execute("SELECT expected_action_id, constraints->'day' AS day FROM expected_actions WHERE constraints ? 'day'").fetchall()
+        _execute_batch(
+            conn,
+            "UPDATE expected_actions SET day_index = %s WHERE expected_action_id = %s",
+            [(_day_index_from_value(r["day"]), r["expected_action_id"]) for r in rows],
+        )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expected_session_day ON expected_actions(session_id, day_index)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_canonical_session_match ON canonical_actions(session_id, action_type, target_ref)")
+
+
+def _migrate_canonical_time_info(conn):
+    # Time info the rules compare against, extracted from value_final/context once at ingest
+    has_time_info = conn.execute(
+        """
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'canonical_actions' AND column_name = 'weekday_index'
+        """
+    ).fetchone()
+    if not has_time_info:
+        conn.execute(
+            """
+            ALTER TABLE canonical_actions
+            ADD COLUMN weekday_index SMALLINT,
+            ADD COLUMN slot TEXT,
+            ADD COLUMN minute_of_day SMALLINT
+            """
+        )
+        rows = conn.execute("SELECT canonical_action_id, value_final, context FROM canonical_actions").fetchall()
+        _execute_batch(
+            conn,
+            "UPDATE canonical_actions SET weekday_index = %s, slot = %s, minute_of_day = %s WHERE canonical_action_id = %s",
+            [(*_extract_actual_time_info(r), r["canonical_action_id"]) for r in rows],
+        )
+
+
+def _migrate_session_comparison_mode(conn):
+    # comparison_mode lives in the payload but is needed on every day resolution
+    has_comparison_mode = conn.execute(
+        """
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'sessions' AND column_name = 'comparison_mode'
+        """
+    ).fetchone()
+    if not has_comparison_mode:
+        conn.execute("ALTER TABLE sessions ADD COLUMN comparison_mode TEXT")
+        conn.execute("UPDATE sessions SET comparison_mode = COALESCE(payload->>'comparison_mode', 'backend')")
+
+
+def _migrate_comparison_rollups(conn):
+    # Comparison outcome counts, kept in step with comparisons by _refresh_comparison_rollups.
+    # NULL dimensions are stored as '' so they can be part of the primary key.
+    has_rollups = conn.execute("SELECT to_regclass('comparison_rollups') IS NOT NULL AS present").fetchone()["present"]
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS session_comparison_rollups (
+            session_id TEXT NOT NULL,
+            version_id TEXT NOT NULL,
+            rule_id TEXT NOT NULL,
+            stakeholder_id TEXT NOT NULL,
+            outcome TEXT NOT NULL,
+            count BIGINT NOT NULL,
+            PRIMARY KEY (session_id, rule_id, stakeholder_id, outcome),
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS comparison_rollups (
+            version_id TEXT NOT NULL,
+            rule_id TEXT NOT NULL,
+            stakeholder_id TEXT NOT NULL,
+            outcome TEXT NOT NULL,
+            count BIGINT NOT NULL,
+            PRIMARY KEY (version_id, rule_id, stakeholder_id, outcome)
+        )
+        """
+    )
+    if not has_rollups:
+        conn.execute(f"INSERT INTO session_comparison_rollups {SESSION_ROLLUP_SELECT} GROUP BY 1, 2, 3, 4, 5")
+        conn.execute(
+            """
+            INSERT INTO comparison_rollups (version_id, rule_id, stakeholder_id, outcome, count)
+            SELECT version_id, rule_id, stakeholder_id, outcome, sum(count)
+            FROM session_comparison_rollups
+            GROUP BY 1, 2, 3, 4
+            """
+        )
+
+
+def _migrate_daily_state_snapshots(conn):
+    # Running totals of daily_effects deltas per (session, day), kept by _refresh_daily_state
+    has_daily_state = conn.execute("SELECT to_regclass('daily_state_snapshots') IS NOT NULL AS present").fetchone()["present"]
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS daily_state_snapshots (
+            session_id TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            global_state JSONB NOT NULL,
+            stakeholder_state JSONB NOT NULL,
+            PRIMARY KEY (session_id, day),
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+        )
+        """
+    )
+    if not has_daily_state:
+        for row in conn.execute("SELECT DISTINCT session_id FROM daily_effects").fetchall():
+            _refresh_daily_state(conn, row["session_id"])
+
+
+def _migrate_ingest_jobs(conn):
+    # Durable queue behind POST /sessions/ingest; drained by _ingest_worker with SKIP LOCKED
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ingest_jobs (
+            job_id TEXT PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            payload JSONB NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result JSONB,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_jobs_queued ON ingest_jobs(created_at) WHERE status = 'queued'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_jobs_session ON ingest_jobs(session_id)")
+
+
+def _migrate_payload_compression(conn):
+    # Compressed storage for sessions.payload (SESSION_PAYLOAD_CODEC=zstd): payload stays NULL and the
+    # export lives in payload_blob. The blob is already compressed, so TOAST must not try again.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS payload_dictionaries (
+            dict_id SERIAL PRIMARY KEY,
+            dictionary BYTEA NOT NULL,
+            sample_count INTEGER NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        ALTER TABLE sessions
+        ALTER COLUMN payload DROP NOT NULL,
+        ADD COLUMN IF NOT EXISTS payload_codec TEXT,
+        ADD COLUMN IF NOT EXISTS payload_blob BYTEA,
+        ADD COLUMN IF NOT EXISTS payload_dict_id INTEGER REFERENCES payload_dictionaries(dict_id)
+        """
+    )
+    conn.execute("ALTER TABLE sessions ALTER COLUMN payload_blob SET STORAGE EXTERNAL")
+
+
+def _migrate_ingest_job_retries(conn):
+    # not_before: earliest retry of a failed job. Done jobs drop their payload (the session holds it).
+    conn.execute(
+        """
+        ALTER TABLE ingest_jobs
+        ALTER COLUMN payload DROP NOT NULL,
+        ADD COLUMN IF NOT EXISTS not_before TEXT
+        """
+    )
+    conn.execute("UPDATE ingest_jobs SET payload = NULL WHERE status = 'done'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_jobs_session_queued ON ingest_jobs(session_id, created_at) WHERE status = 'queued'")
+
+
+def _migrate_ingest_job_body(conn):
+    # The request body as sent (TEXT), so queued sessions are stored like POST /sessions stores them.
+    # Jobs queued before this keep their JSONB payload.
+    conn.execute("ALTER TABLE ingest_jobs ADD COLUMN IF NOT EXISTS body TEXT")
+
+
+def _migrate_archived_sessions(conn):
+    # Where archive_sessions.py put each cold session: ARCHIVE_DIR/<table>/month=<month>/<file_name>
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS archived_sessions (
+            session_id TEXT PRIMARY KEY,
+            month TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            archived_at TEXT NOT NULL,
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+        )
+        """
+    )
+
+
+MIGRATIONS = (
+    (1, "base_schema", _migrate_base_schema),
+    (2, "incremental_sync", _migrate_incremental_sync),
+    (3, "normalization_runs", _migrate_normalization_runs),
+    (4, "session_revision", _migrate_session_revision),
+    (5, "jsonb_columns", _migrate_jsonb_columns),
+    (6, "expected_day_index", _migrate_expected_day_index),
+    (7, "canonical_time_info", _migrate_canonical_time_info),
+    (8, "session_comparison_mode", _migrate_session_comparison_mode),
+    (9, "comparison_rollups", _migrate_comparison_rollups),
+    (10, "daily_state_snapshots", _migrate_daily_state_snapshots),
+    (11, "ingest_jobs", _migrate_ingest_jobs),
+    (12, "payload_compression", _migrate_payload_compression),
+    (13, "archived_sessions", _migrate_archived_sessions),
+    (14, "ingest_job_retries", _migrate_ingest_job_retries),
+    (15, "ingest_job_body", _migrate_ingest_job_body),
+)
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _schema_version(conn):
+    if conn.execute("SELECT to_regclass('schema_migrations') IS NULL AS missing").fetchone()["missing"]:
+        return 0
+    return conn.execute("SELECT COALESCE(max(version), 0) AS version FROM schema_migrations").fetchone()["version"]
+
+
+def create_schema(conn):
+    # Fast path for every process start once the database is current: one catalog lookup + one max()
+    if _schema_version(conn) >= SCHEMA_VERSION:
+        return
+    # Concurrent starters queue on the lock; whoever gets it second finds the work done
+    conn.execute("SELECT pg_advisory_lock(hashtext('schema_migrations'))")
+    try:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.commit()
+        applied = {r["version"] for r in conn.execute("SELECT version FROM schema_migrations").fetchall()}
+        for version, name, step in MIGRATIONS:
+            if version in applied:
+                continue
+            step(conn)
+            conn.execute(
+                "INSERT INTO schema_migrations (version, name, applied_at) VALUES (%s, %s, %s)",
+                (version, name, datetime.now(timezone.utc).isoformat()),
+            )
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("SELECT pg_advisory_unlock(hashtext('schema_migrations'))")
+        conn.commit()
 
 
 def init_db():
@@ -431,9 +908,27 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(PoolTimeout)
+def pool_timeout_handler(request, exc):
+    return JSONResponse(status_code=503, content={"detail": "database busy, retry later"})
+
+
 @app.on_event("startup")
-def startup_event():
-    init_db()
+async def startup_event():
+    if THREADPOOL_SIZE:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = int(THREADPOOL_SIZE)
+    await run_in_threadpool(get_pool)
+    await get_async_pool()
+    await run_in_threadpool(init_db)
+    load_rule_plugins()
+    start_ingest_workers()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await run_in_threadpool(stop_ingest_workers)
+    await close_async_pool()
+    await run_in_threadpool(close_pool)
 
 
 @app.get("/health")
@@ -441,8 +936,148 @@ def health():
     return {"ok": True}
 
 
+def _pool_stats(pool):
+    stats = pool.get_stats()
+    return {
+        "pool_min": stats.get("pool_min"),
+        "pool_max": stats.get("pool_max"),
+        "pool_size": stats.get("pool_size"),
+        "pool_available": stats.get("pool_available"),
+        "requests_waiting": stats.get("requests_waiting"),
+        "requests_num": stats.get("requests_num", 0),
+        "requests_queued": stats.get("requests_queued", 0),
+        "requests_wait_ms": stats.get("requests_wait_ms", 0),
+        "requests_errors": stats.get("requests_errors", 0),
+        "connections_lost": stats.get("connections_lost", 0),
+    }
+
+
+@app.get("/health/db")
+async def health_db():
+    return {
+        "ok": True,
+        **_pool_stats(get_pool()),
+        "async_pool": _pool_stats(await get_async_pool()),
+    }
+
+
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+class ResponseCache:
+    # In-process LRU of encoded response bodies, bounded by total bytes. Entries are keyed by
+    # (kind, session_id) and tagged with the session revision, so a stale entry is never served
+    # even when another worker process wrote the session.
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def get(self, kind: str, session_id: str, revision: int):
+        with self._lock:
+            entry = self._entries.get((kind, session_id))
+            if entry is None or entry[0] != revision:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((kind, session_id))
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, kind: str, session_id: str, revision: int):
+        # Like get, but leaves the hit/miss counters and the LRU order alone
+        with self._lock:
+            entry = self._entries.get((kind, session_id))
+            return entry[1] if entry is not None and entry[0] == revision else None
+
+    def put(self, kind: str, session_id: str, revision: int, body: bytes):
+        # Bodies larger than a quarter of the budget would just flush everything else
+        if len(body) > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._entries.pop((kind, session_id), None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[(kind, session_id)] = (revision, body)
+            self._size += len(body)
+            while self._size > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def invalidate(self, session_id: str):
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == session_id]:
+                self._size -= len(self._entries.pop(key)[1])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+            }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES)
+
+
+@app.get("/health/cache")
+def health_cache():
+    return {"ok": True, **response_cache.stats()}
+
+
+def _etag(kind: str, revision: int) -> str:
+    return f'"{kind}-{revision}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _touch_session(conn, session_id: str):
+    conn.execute(
+        "UPDATE sessions SET revision = nextval('session_revision_seq') WHERE session_id = %s",
+        (session_id,),
+    )
+    response_cache.invalidate(session_id)
+
+
+# JSONB rejects the \u0000 escape (TEXT stored it before the JSONB switch), so NULs are dropped from
+# JSON text bound for JSONB. An escaped backslash followed by "u0000" is literal text and stays.
+_JSON_NUL_ESCAPE = re.compile(r"(?<!\\)((?:\\\\)*)\\u0000")
+
+
+def _strip_json_nul(text: str) -> str:
+    return _JSON_NUL_ESCAPE.sub(r"\1", text) if "\\u0000" in text else text
+
+
+def _json_dumps_fast(value) -> str:
+    # orjson for speed; the stdlib covers what it refuses (ints beyond 64 bits, exotic types)
+    try:
+        return _strip_json_nul(orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8"))
+    except TypeError:
+        return _strip_json_nul(json.dumps(value, ensure_ascii=False))
+
+
 def _json_dump(value):
-    return json.dumps(value, ensure_ascii=False) if value is not None else None
+    return _json_dumps_fast(value) if value is not None else None
 
 
 def _json_load(value):
@@ -456,6 +1091,137 @@ def _json_load(value):
         return value
 
 
+# "jsonb" keeps session exports in sessions.payload; "zstd" compresses them into payload_blob with the
+# newest dictionary in payload_dictionaries (trained by compress_payloads.py). Reads handle both.
+SESSION_PAYLOAD_CODEC = os.getenv("SESSION_PAYLOAD_CODEC", "jsonb")
+PAYLOAD_ZSTD_LEVEL = int(os.getenv("PAYLOAD_ZSTD_LEVEL", "9"))
+SESSION_PAYLOAD_COLUMNS = "payload, payload_codec, payload_blob, payload_dict_id"
+
+# Dictionaries never change once trained, so each one is fetched once per process
+_payload_dictionaries = {}
+
+
+def _payload_dictionary_from_bytes(dict_id, data):
+    dictionary = zstandard.ZstdCompressionDict(bytes(data))
+    _payload_dictionaries[dict_id] = dictionary
+    return dictionary
+
+
+def _payload_dictionary(conn, dict_id):
+    if dict_id is None:
+        return None
+    if dict_id not in _payload_dictionaries:
+        row = conn.execute("SELECT dictionary FROM payload_dictionaries WHERE dict_id = %s", (dict_id,)).fetchone()
+        return _payload_dictionary_from_bytes(dict_id, row["dictionary"])
+    return _payload_dictionaries[dict_id]
+
+
+async def _payload_dictionary_async(conn, dict_id):
+    if dict_id is None:
+        return None
+    if dict_id not in _payload_dictionaries:
+        cur = await conn.execute("SELECT dictionary FROM payload_dictionaries WHERE dict_id = %s", (dict_id,))
+        row = await cur.fetchone()
+        return _payload_dictionary_from_bytes(dict_id, row["dictionary"])
+    return _payload_dictionaries[dict_id]
+
+
+def _encode_session_payload(conn, payload: str, codec: str | None = None):
+    # -> (payload, payload_codec, payload_blob, payload_dict_id) for the sessions row
+    if (codec or SESSION_PAYLOAD_CODEC) != "zstd":
+        return payload, None, None, None
+    dict_id = conn.execute("SELECT max(dict_id) AS dict_id FROM payload_dictionaries").fetchone()["dict_id"]
+    compressor = zstandard.ZstdCompressor(level=PAYLOAD_ZSTD_LEVEL, dict_data=_payload_dictionary(conn, dict_id))
+    return None, "zstd", compressor.compress(payload.encode("utf-8")), dict_id
+
+
+def _decompress_session_payload(row, dictionary) -> bytes:
+    return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(row["payload_blob"])
+
+
+def _session_payload_text(conn, row) -> str:
+    # Stored export as JSON text; row carries SESSION_PAYLOAD_COLUMNS with payload selected as ::text
+    if row["payload_codec"] == "zstd":
+        return _decompress_session_payload(row, _payload_dictionary(conn, row["payload_dict_id"])).decode("utf-8")
+    return row["payload"]
+
+
+def _load_session_payload(conn, row) -> dict:
+    # row carries session_id and SESSION_PAYLOAD_COLUMNS
+    if row["payload_codec"] == "zstd":
+        return json.loads(_decompress_session_payload(row, _payload_dictionary(conn, row["payload_dict_id"])))
+    if row["payload_codec"] == "archive":
+        return json.loads(_read_archived_payload(_archived_session(conn, row["session_id"]), row["session_id"]))
+    return _json_load(row["payload"])
+
+
+# ---- Cold archive ----
+# archive_sessions.py moves sessions older than ARCHIVE_AFTER_DAYS out of the hot tables: the payload
+# (payload_codec = 'archive') and the ARCHIVE_TABLES rows go to Parquet files partitioned by month,
+# the sessions row and the small derived tables stay. Storing the session again makes it hot.
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", str(BASE_DIR / "archive")))
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_TABLES = ("mechanic_events", "process_logs", "player_actions_log")
+
+
+def _archive_path(table: str, archive) -> Path:
+    return ARCHIVE_DIR / table / f"month={archive['month']}" / archive["file_name"]
+
+
+def _archived_session(conn, session_id: str):
+    return conn.execute("SELECT month, file_name FROM archived_sessions WHERE session_id = %s", (session_id,)).fetchone()
+
+
+def _read_archive(table: str, archive, session_id: str) -> list:
+    path = _archive_path(table, archive)
+    if not path.exists():
+        # No file: the batch had no rows for this table
+        return []
+    return pq.read_table(path, filters=[("session_id", "=", session_id)]).to_pylist()
+
+
+def _read_archived_payload(archive, session_id: str) -> bytes:
+    rows = _read_archive("sessions", archive, session_id)
+    if not rows:
+        raise RuntimeError(f"archived payload of session {session_id} is missing from {_archive_path('sessions', archive)}")
+    return rows[0]["payload"].encode("utf-8")
+
+
+def _read_archived_rows(table: str, archive, session_id: str) -> list:
+    # JSONB columns are archived as JSON text
+    rows = _read_archive(table, archive, session_id)
+    for row in rows:
+        for column in JSONB_COLUMNS.get(table, ()):
+            row[column] = _json_load(row[column])
+    return rows
+
+
+def _fsync_dir(path: Path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_archive(table: str, archive, rows: list):
+    # Durable before it returns: the caller deletes the hot rows right after
+    if not rows:
+        return
+    path = _archive_path(table, archive)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Written aside and renamed, so readers never see a partial file
+    partial = path.with_name(f".{path.name}.partial")
+    with open(partial, "wb") as f:
+        pq.write_table(pa.Table.from_pylist(rows), f, compression="zstd")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(partial, path)
+    # The rename and any directories created for it
+    for directory in (path.parent, path.parent.parent, ARCHIVE_DIR):
+        _fsync_dir(directory)
+
+
 def _resolve_anonymous_user_id(session_id, raw_user_id):
     for candidate in (raw_user_id, session_id):
         if not candidate:
@@ -469,13 +1235,23 @@ def _resolve_anonymous_user_id(session_id, raw_user_id):
 
 # ---- Helpers for comparison rules ----
 import unicodedata
-from typing import Any
+from functools import lru_cache
+from typing import Any, NamedTuple
+
+# Bound for the memoized parsers below; constraint/day/slot strings come from a small vocabulary
+RULE_CACHE_SIZE = int(os.getenv("RULE_CACHE_SIZE", "4096"))
+
+
+@lru_cache(maxsize=RULE_CACHE_SIZE)
+def _fold_text(text: str) -> str:
+    normalized = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in normalized if not unicodedata.combining(ch)).lower().strip()
+
 
 def _normalize_text(value) -> str:
     if value is None:
         return ""
-    normalized = unicodedata.normalize("NFKD", str(value))
-    return "".join(ch for ch in normalized if not unicodedata.combining(ch)).lower().strip()
+    return _fold_text(str(value))
 
 
 DAY_INDEX = {
@@ -542,7 +1318,11 @@ def _parse_datetime(value):
     if value is None:
         return None
     if isinstance(value, (int, float)):
-        return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+        try:
+            return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+        except (ValueError, OverflowError, OSError):
+            # Out of range (or NaN/inf) epoch millis
+            return None
     if isinstance(value, str):
         try:
             return datetime.fromisoformat(value.replace("Z", "+00:00"))
@@ -551,9 +1331,53 @@ def _parse_datetime(value):
     return None
 
 
-def _extract_actual_time_info(actual: dict):
-    vf = _json_load(actual.get("value_final")) or {}
-    ctx = _json_load(actual.get("context")) or {}
+class TimeConstraint(NamedTuple):
+    day: int | None
+    slot: str | None
+    start: int | None
+    end: int | None
+    grace_days: int
+
+
+class ActualTime(NamedTuple):
+    weekday_index: int | None
+    slot: str | None
+    minute_of_day: int | None
+
+
+def _build_time_constraint(day, time_window, grace_days) -> TimeConstraint:
+    window = _parse_time_window(time_window) or {}
+    return TimeConstraint(
+        _day_index_from_value(day),
+        window.get("slot"),
+        window.get("start"),
+        window.get("end"),
+        int(grace_days or 0),
+    )
+
+
+# typed: 1 (Monday) and 1.0 (not a weekday) must not share an entry
+_cached_time_constraint = lru_cache(maxsize=RULE_CACHE_SIZE, typed=True)(_build_time_constraint)
+
+
+def _compile_time_constraint(constraints: dict) -> TimeConstraint:
+    args = (constraints.get("day"), constraints.get("time_window"), constraints.get("grace_days"))
+    try:
+        return _cached_time_constraint(*args)
+    except TypeError:
+        # Unhashable constraint values (lists/objects) skip the cache
+        return _build_time_constraint(*args)
+
+
+def _json_dict(value) -> dict:
+    # value_final/context are free-form (any JSON); only objects carry time info
+    value = _json_load(value)
+    return value if isinstance(value, dict) else {}
+
+
+def _extract_actual_time_info(actual: dict) -> ActualTime:
+    vf = _json_dict(actual.get("value_final"))
+    ctx = _json_dict(actual.get("context"))
     day_value = vf.get("day") or ctx.get("day")
     slot_value = vf.get("time_slot") or vf.get("slot") or ctx.get("time_slot")
     dt_value = vf.get("datetime") or vf.get("scheduled_at") or vf.get("arrived_at")
@@ -568,7 +1392,7 @@ def _extract_actual_time_info(actual: dict):
     if slot is None and parsed_dt:
         slot = "AM" if parsed_dt.hour < 12 else "PM"
 
-    return {"weekday_index": weekday_index, "slot": slot, "minute_of_day": minute_of_day}
+    return ActualTime(weekday_index, slot, minute_of_day)
 
 
 # Rule handlers
@@ -576,8 +1400,8 @@ def _default_rule(expected: dict, actual: dict):
     constraints = expected.get("constraints") or {}
     if not constraints:
         return {"outcome": "TRUE"}
-    vf = _json_load(actual.get("value_final")) or {}
-    ctx = _json_load(actual.get("context")) or {}
+    vf = _json_dict(actual.get("value_final"))
+    ctx = _json_dict(actual.get("context"))
     merged = {**ctx, **vf}
     for k, v in constraints.items():
         if merged.get(k) != v:
@@ -585,71 +1409,165 @@ def _default_rule(expected: dict, actual: dict):
     return {"outcome": "TRUE"}
 
 
-def _rule_time_and_day(expected: dict, actual: dict):
-    constraints = expected.get("constraints") or {}
-    exp_day = _day_index_from_value(constraints.get("day"))
-    exp_window = _parse_time_window(constraints.get("time_window"))
-    grace_days = int(constraints.get("grace_days") or 0)
-    info = _extract_actual_time_info(actual)
-    actual_day = info.get("weekday_index")
-    if exp_day is not None:
+def _time_and_day_matches(rule: TimeConstraint, info: ActualTime) -> bool:
+    actual_day = info.weekday_index
+    if rule.day is not None:
         if actual_day is None:
-            return {"outcome": "FALSE"}
-        delta = actual_day - exp_day
-        if delta < 0 or delta > grace_days:
-            return {"outcome": "FALSE"}
+            return False
+        delta = actual_day - rule.day
+        if delta < 0 or delta > rule.grace_days:
+            return False
     # Only enforce time window if estamos en el día de la expected; si se usa gracia al día siguiente, aceptamos sin ventana de slot
-    if exp_window and exp_day is not None and actual_day == exp_day:
-        if "slot" in exp_window:
-            if info.get("slot") != exp_window["slot"]:
-                return {"outcome": "FALSE"}
-        else:
-            m = info.get("minute_of_day")
-            if m is None or not (exp_window["start"] <= m <= exp_window["end"]):
-                return {"outcome": "FALSE"}
-    return {"outcome": "TRUE"}
+    if rule.day is not None and actual_day == rule.day:
+        if rule.slot is not None:
+            return info.slot == rule.slot
+        if rule.start is not None:
+            m = info.minute_of_day
+            return m is not None and rule.start <= m <= rule.end
+    return True
 
 
-RULE_HANDLERS = {
-    "default_rule": _default_rule,
-    "meeting_time_rule_v1": _rule_time_and_day,
-    "visit_stakeholder_rule_v1": _rule_time_and_day,
-    "research_hours_rule_v1": _rule_time_and_day,
-    "admin_decision_rule_v1": _rule_time_and_day,
-}
+def _time_inputs(expected: dict, actual: dict):
+    # time_constraint / time_info are precompiled by resolve_day_effects; raw dicts are compiled on the fly
+    rule = expected.get("time_constraint") or _compile_time_constraint(expected.get("constraints") or {})
+    info = actual.get("time_info") or _extract_actual_time_info(actual)
+    return rule, info
 
-RULE_EFFECTS = {
-    # Valores por defecto si el expected no define sus propios efectos.
-    "meeting_time_rule_v1": {
-        "TRUE": {"global": {"reputation": 10}},
-        "FALSE": {"global": {"reputation": -10}},
-    },
-    "visit_stakeholder_rule_v1": {
-        "TRUE": {"stakeholder": {"trust": 10}},
-        "FALSE": {"stakeholder": {"trust": -10}},
-    },
-    "research_hours_rule_v1": {
-        "TRUE": {"global": {"reputation": 10}},
-        "FALSE": {"global": {"reputation": -10}},
-    },
-    "admin_decision_rule_v1": {
-        "TRUE": {},
-        "FALSE": {},
-    },
-    "default_rule": {
-        "TRUE": {},
-        "FALSE": {},
-    },
-}
 
+def _rule_time_and_day(expected: dict, actual: dict):
+    return {"outcome": "TRUE" if _time_and_day_matches(*_time_inputs(expected, actual)) else "FALSE"}
 
-def _pick_best_match(expected: dict, matches: list):
-    created_at = expected.get("created_at") or 0
-    after = [m for m in matches if (m.get("committed_at") or 0) >= created_at]
-    after.sort(key=lambda a: a.get("committed_at") or 0)
-    if after:
-        return after[0]
-    return sorted(matches, key=lambda a: a.get("committed_at") or 0)[0]
+
+def _rule_time_and_day_batch(pairs: list):
+    compiled = [_time_inputs(expected, actual) for expected, actual in pairs]
+    return ["TRUE" if _time_and_day_matches(rule, info) else "FALSE" for rule, info in compiled]
+
+
+# ---- Rule registry ----
+# rule_id -> {version_id or None: RuleSpec}. A version-specific registration wins over the generic
+# one for sessions of that simulator version. Built-in rules are registered below; extra rules live in
+# plugin modules listed in RULE_PLUGINS (comma-separated import paths), each exposing
+# register_rules(register) which is called with register_rule.
+RULE_PLUGINS = os.getenv("RULE_PLUGINS", "")
+
+
+class RuleSpec(NamedTuple):
+    rule_id: str
+    handler: Any
+    batch: Any
+    effects: dict
+
+
+RULES: dict = {}
+_loaded_rule_plugins: set = set()
+
+
+def register_rule(rule_id: str, handler, batch=None, effects=None, versions=None):
+    # handler(expected, actual) -> {"outcome": "TRUE" | "FALSE"}
+    # batch([(expected, actual), ...]) -> ["TRUE" | "FALSE", ...], same order; optional
+    spec = RuleSpec(rule_id, handler, batch, effects or {"TRUE": {}, "FALSE": {}})
+    for version_id in versions or (None,):
+        RULES.setdefault(rule_id, {})[version_id] = spec
+    return spec
+
+
+def get_rule(rule_id: str | None, version_id: str | None = None):
+    versions = RULES.get(rule_id or "default_rule")
+    if not versions:
+        return None
+    return versions.get(version_id) or versions.get(None)
+
+
+def load_rule_plugins(modules: str | None = None):
+    import importlib
+
+    names = [name.strip() for name in (RULE_PLUGINS if modules is None else modules).split(",") if name.strip()]
+    for name in names:
+        if name in _loaded_rule_plugins:
+            continue
+        importlib.import_module(name).register_rules(register_rule)
+        _loaded_rule_plugins.add(name)
+    return names
+
+
+def evaluate_rules(pairs: list, version_id: str | None = None):
+    # pairs: [(expected, actual), ...] -> outcomes in the same order. Pairs are grouped per rule so
+    # rules with a batch evaluator score their whole group in one call.
+    groups = {}
+    for position, (expected, actual) in enumerate(pairs):
+        spec = get_rule(expected.get("rule_id"), version_id) or get_rule("default_rule", version_id)
+        groups.setdefault(id(spec), (spec, []))[1].append(position)
+    outcomes = [None] * len(pairs)
+    for spec, positions in groups.values():
+        group = [pairs[position] for position in positions]
+        if spec.batch is not None:
+            results = spec.batch(group)
+        else:
+            results = [spec.handler(expected, actual).get("outcome") for expected, actual in group]
+        for position, outcome in zip(positions, results):
+            outcomes[position] = "TRUE" if outcome == "TRUE" else "FALSE"
+    return outcomes
+
+
+def rule_effect(expected: dict, outcome: str, version_id: str | None = None):
+    # Effects declared on the expected action win over the rule's defaults
+    custom = (expected.get("effects") or {}).get(outcome)
+    if custom is not None:
+        return custom
+    spec = get_rule(expected.get("rule_id"), version_id)
+    return spec.effects.get(outcome) if spec else None
+
+
+# Valores por defecto si el expected no define sus propios efectos.
+register_rule("default_rule", _default_rule, effects={"TRUE": {}, "FALSE": {}})
+register_rule(
+    "meeting_time_rule_v1",
+    _rule_time_and_day,
+    batch=_rule_time_and_day_batch,
+    effects={"TRUE": {"global": {"reputation": 10}}, "FALSE": {"global": {"reputation": -10}}},
+)
+register_rule(
+    "visit_stakeholder_rule_v1",
+    _rule_time_and_day,
+    batch=_rule_time_and_day_batch,
+    effects={"TRUE": {"stakeholder": {"trust": 10}}, "FALSE": {"stakeholder": {"trust": -10}}},
+)
+register_rule(
+    "research_hours_rule_v1",
+    _rule_time_and_day,
+    batch=_rule_time_and_day_batch,
+    effects={"TRUE": {"global": {"reputation": 10}}, "FALSE": {"global": {"reputation": -10}}},
+)
+register_rule("admin_decision_rule_v1", _rule_time_and_day, batch=_rule_time_and_day_batch, effects={"TRUE": {}, "FALSE": {}})
+
+
+class CanonicalIndex:
+    # Canonical actions bucketed by (action_type, target_ref, mechanic_id), plus a mechanic-agnostic
+    # bucket for expected actions that do not pin a mechanic. Each bucket is sorted by committed_at
+    # (stable, so ties keep load order) and keeps a parallel key list for bisect.
+
+    def __init__(self, canonical_actions: list):
+        self._exact = {}
+        self._any = {}
+        for act in canonical_actions:
+            self._exact.setdefault((act["action_type"], act["target_ref"], act["mechanic_id"]), []).append(act)
+            self._any.setdefault((act["action_type"], act["target_ref"]), []).append(act)
+        for buckets in (self._exact, self._any):
+            for key, actions in buckets.items():
+                actions.sort(key=lambda a: a.get("committed_at") or 0)
+                buckets[key] = ([a.get("committed_at") or 0 for a in actions], actions)
+
+    def best_match(self, expected: dict):
+        # First action committed at or after the expected was created; otherwise the earliest one
+        if expected.get("mechanic_id"):
+            bucket = self._exact.get((expected["action_type"], expected["target_ref"], expected["mechanic_id"]))
+        else:
+            bucket = self._any.get((expected["action_type"], expected["target_ref"]))
+        if not bucket:
+            return None
+        committed, actions = bucket
+        position = bisect_left(committed, expected.get("created_at") or 0)
+        return actions[position] if position < len(actions) else actions[0]
 
 
 def _extract_stakeholder_id(target_ref: str):
@@ -673,18 +1591,388 @@ def _apply_effects(global_deltas: dict, stakeholder_deltas: dict, effect: dict,
             stakeholder_deltas[sid] = curr
 
 
-def normalize_session(conn, session_id: str, session: dict, created_at: str):
+# ---- Bulk write helpers ----
+EXPECTED_ACTION_UPSERT = """
+    INSERT INTO expected_actions (expected_action_id, session_id, source_node_id, source_option_id, action_type, target_ref, constraints, rule_id, created_at, mechanic_id, effects, day_index, row_hash)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (expected_action_id) DO UPDATE SET
+        session_id = EXCLUDED.session_id,
+        source_node_id = EXCLUDED.source_node_id,
+        source_option_id = EXCLUDED.source_option_id,
+        action_type = EXCLUDED.action_type,
+        target_ref = EXCLUDED.target_ref,
+        constraints = EXCLUDED.constraints,
+        rule_id = EXCLUDED.rule_id,
+        created_at = EXCLUDED.created_at,
+        mechanic_id = EXCLUDED.mechanic_id,
+        effects = EXCLUDED.effects,
+        day_index = EXCLUDED.day_index,
+        row_hash = EXCLUDED.row_hash
+"""
+
+CANONICAL_ACTION_UPSERT = """
+    INSERT INTO canonical_actions (canonical_action_id, session_id, mechanic_id, action_type, target_ref, value_final, committed_at, context, weekday_index, slot, minute_of_day, row_hash)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (canonical_action_id) DO UPDATE SET
+        session_id = EXCLUDED.session_id,
+        mechanic_id = EXCLUDED.mechanic_id,
+        action_type = EXCLUDED.action_type,
+        target_ref = EXCLUDED.target_ref,
+        value_final = EXCLUDED.value_final,
+        committed_at = EXCLUDED.committed_at,
+        context = EXCLUDED.context,
+        weekday_index = EXCLUDED.weekday_index,
+        slot = EXCLUDED.slot,
+        minute_of_day = EXCLUDED.minute_of_day,
+        row_hash = EXCLUDED.row_hash
+"""
+
+MECHANIC_EVENT_UPSERT = """
+    INSERT INTO mechanic_events (event_id, session_id, mechanic_id, event_type, timestamp, payload, row_hash)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (event_id) DO UPDATE SET
+        session_id = EXCLUDED.session_id,
+        mechanic_id = EXCLUDED.mechanic_id,
+        event_type = EXCLUDED.event_type,
+        timestamp = EXCLUDED.timestamp,
+        payload = EXCLUDED.payload,
+        row_hash = EXCLUDED.row_hash
+"""
+
+DAILY_EFFECT_UPSERT = """
+    INSERT INTO daily_effects (session_id, day, comparisons, global_deltas, stakeholder_deltas, created_at, status, applied_at, row_hash)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (session_id, day) DO UPDATE SET
+        comparisons = EXCLUDED.comparisons,
+        global_deltas = EXCLUDED.global_deltas,
+        stakeholder_deltas = EXCLUDED.stakeholder_deltas,
+        created_at = EXCLUDED.created_at,
+        status = EXCLUDED.status,
+        applied_at = EXCLUDED.applied_at,
+        row_hash = EXCLUDED.row_hash
+"""
+
+SESSION_STATE_UPSERT = """
+    INSERT INTO session_state (session_id, stakeholders, global_state, row_hash)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (session_id) DO UPDATE SET
+        stakeholders = EXCLUDED.stakeholders,
+        global_state = EXCLUDED.global_state,
+        row_hash = EXCLUDED.row_hash
+"""
+
+SESSION_STAKEHOLDER_UPSERT = """
+    INSERT INTO session_stakeholders (session_id, stakeholder_id, state, row_hash)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (session_id, stakeholder_id) DO UPDATE SET
+        state = EXCLUDED.state,
+        row_hash = EXCLUDED.row_hash
+"""
+
+QUESTION_UPSERT = """
+    INSERT INTO questions (pregunta_id, stakeholder_id, texto_pregunta, texto_respuesta, atributo_global_min, acciones_requeridas)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT (pregunta_id) DO UPDATE SET
+        stakeholder_id = EXCLUDED.stakeholder_id,
+        texto_pregunta = EXCLUDED.texto_pregunta,
+        texto_respuesta = EXCLUDED.texto_respuesta,
+        atributo_global_min = EXCLUDED.atributo_global_min,
+        acciones_requeridas = EXCLUDED.acciones_requeridas
+"""
+
+# Insert-only tables (no upsert semantics) are streamed with COPY.
+EXPLICIT_DECISION_COLUMNS = ("session_id", "node_id", "option_id", "option_text", "stakeholder", "day", "time_slot", "consequences")
+COMPARISON_COLUMNS = ("session_id", "expected_action_id", "canonical_action_id", "outcome", "deviation", "rule_id")
+PROCESS_LOG_COLUMNS = ("session_id", "node_id", "start_time", "end_time", "total_duration", "final_choice", "events")
+PLAYER_ACTION_COLUMNS = ("session_id", "event", "metadata", "day", "time_slot", "timestamp")
+QUESTION_REQUIREMENT_COLUMNS = ("pregunta_id", "trust_min", "support_min", "reputation_min")
+
+# Per-session child tables kept in sync by normalize_session, in write order.
+# Keyed tables are diffed by key; keyless ones (BIGSERIAL ids) by their multiset of row hashes.
+# expected_actions are never deleted (see README: se siembran una vez y no se borran).
+SYNC_TABLES = {
+    "explicit_decisions": {"columns": EXPLICIT_DECISION_COLUMNS, "id": "decision_id", "delete_missing": True},
+    "expected_actions": {"key": "expected_action_id", "key_index": 0, "upsert": EXPECTED_ACTION_UPSERT, "delete_missing": False},
+    "canonical_actions": {"key": "canonical_action_id", "key_index": 0, "upsert": CANONICAL_ACTION_UPSERT, "delete_missing": True},
+    "mechanic_events": {"key": "event_id", "key_index": 0, "upsert": MECHANIC_EVENT_UPSERT, "delete_missing": True},
+    "comparisons": {"columns": COMPARISON_COLUMNS, "id": "comparison_id", "delete_missing": True},
+    "daily_effects": {"key": "day", "key_index": 1, "upsert": DAILY_EFFECT_UPSERT, "delete_missing": True},
+    "process_logs": {"columns": PROCESS_LOG_COLUMNS, "id": "process_log_id", "delete_missing": True},
+    "player_actions_log": {"columns": PLAYER_ACTION_COLUMNS, "id": "player_action_id", "delete_missing": True},
+    "session_state": {"key": "session_id", "key_index": 0, "upsert": SESSION_STATE_UPSERT, "delete_missing": True},
+    "session_stakeholders": {"key": "stakeholder_id", "key_index": 1, "upsert": SESSION_STAKEHOLDER_UPSERT, "delete_missing": True},
+}
+
+# "incremental" diffs each child table against what is stored; "full" deletes and rewrites it.
+SESSION_SYNC_MODE = os.getenv("SESSION_SYNC_MODE", "incremental")
+
+
+def _execute_batch(conn, query: str, rows: list):
+    # executemany runs in pipeline mode: one network round trip for the whole batch
+    if not rows:
+        return
+    with conn.cursor() as cur:
+        cur.executemany(query, rows)
+
+
+def _copy_rows(conn, table: str, columns: tuple, rows: list):
+    if not rows:
+        return
+    with conn.cursor() as cur:
+        with cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+
+
+def _row_hash(row: tuple) -> str:
+    try:
+        encoded = orjson.dumps(row, default=str, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        encoded = json.dumps(row, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def _with_row_hash(row: tuple) -> tuple:
+    return row + (_row_hash(row),)
+
+
+def _content_hash(row_hashes: list) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for row_hash in row_hashes:
+        digest.update(row_hash.encode("ascii"))
+    return digest.hexdigest()
+
+
+def _load_sync_state(conn, session_id: str):
+    rows = conn.execute(
+        "SELECT table_name, content_hash FROM session_sync_state WHERE session_id = %s",
+        (session_id,),
+    ).fetchall()
+    return {r["table_name"]: r["content_hash"] for r in rows}
+
+
+def _invalidate_sync_state(conn, session_id: str, tables):
+    # Call after writing child rows outside normalize_session so the next sync re-diffs them
+    conn.execute(
+        "DELETE FROM session_sync_state WHERE session_id = %s AND table_name = ANY(%s)",
+        (session_id, list(tables)),
+    )
+
+
+def _write_sync_rows(conn, table: str, spec: dict, rows: list):
+    if spec.get("upsert"):
+        _execute_batch(conn, spec["upsert"], rows)
+    else:
+        _copy_rows(conn, table, spec["columns"] + ("row_hash",), rows)
+
+
+def _sync_table(conn, session_id: str, table: str, rows: list, sync_state: dict, incremental: bool):
+    spec = SYNC_TABLES[table]
+    hashed_rows = [_with_row_hash(row) for row in rows]
+    content_hash = _content_hash([row[-1] for row in hashed_rows])
+    if incremental and sync_state.get(table) == content_hash:
+        return False
+
+    if not incremental:
+        if spec["delete_missing"]:
+            conn.execute(f"DELETE FROM {table} WHERE session_id = %s", (session_id,))
+        _write_sync_rows(conn, table, spec, hashed_rows)
+    elif spec.get("key"):
+        key = spec["key"]
+        existing = {
+            r[key]: r["row_hash"]
+            for r in conn.execute(f"SELECT {key}, row_hash FROM {table} WHERE session_id = %s", (session_id,)).fetchall()
+        }
+        latest = {}
+        for row in hashed_rows:
+            latest[row[spec["key_index"]]] = row
+        if spec["delete_missing"]:
+            stale = [k for k in existing if k not in latest]
+            if stale:
+                conn.execute(f"DELETE FROM {table} WHERE session_id = %s AND {key} = ANY(%s)", (session_id, stale))
+        _write_sync_rows(conn, table, spec, [row for k, row in latest.items() if existing.get(k) != row[-1]])
+    else:
+        id_column = spec["id"]
+        missing = Counter(row[-1] for row in hashed_rows)
+        stale_ids = []
+        for r in conn.execute(f"SELECT {id_column}, row_hash FROM {table} WHERE session_id = %s", (session_id,)).fetchall():
+            if missing[r["row_hash"]] > 0:
+                missing[r["row_hash"]] -= 1
+            else:
+                stale_ids.append(r[id_column])
+        if stale_ids:
+            conn.execute(f"DELETE FROM {table} WHERE {id_column} = ANY(%s)", (stale_ids,))
+        inserts = []
+        for row in hashed_rows:
+            if missing[row[-1]] > 0:
+                missing[row[-1]] -= 1
+                inserts.append(row)
+        _write_sync_rows(conn, table, spec, inserts)
+
+    conn.execute(
+        """
+        INSERT INTO session_sync_state (session_id, table_name, content_hash)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (session_id, table_name) DO UPDATE SET
+            content_hash = EXCLUDED.content_hash
+        """,
+        (session_id, table, content_hash),
+    )
+    return True
+
+
+SESSION_ROLLUP_SELECT = """
+    SELECT c.session_id,
+           COALESCE(s.version_id, '') AS version_id,
+           COALESCE(c.rule_id, '') AS rule_id,
+           CASE WHEN starts_with(e.target_ref, 'stakeholder:') THEN substr(e.target_ref, 13) ELSE '' END AS stakeholder_id,
+           COALESCE(c.outcome, '') AS outcome,
+           count(*) AS count
+    FROM comparisons c
+    JOIN sessions s ON s.session_id = c.session_id
+    LEFT JOIN expected_actions e ON e.expected_action_id = c.expected_action_id
+"""
+
+COMPARISON_ROLLUP_UPSERT = """
+    INSERT INTO comparison_rollups (version_id, rule_id, stakeholder_id, outcome, count)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (version_id, rule_id, stakeholder_id, outcome) DO UPDATE SET
+        count = comparison_rollups.count + EXCLUDED.count
+"""
+
+SESSION_ROLLUP_COLUMNS = ("session_id", "version_id", "rule_id", "stakeholder_id", "outcome", "count")
+
+
+def _refresh_comparison_rollups(conn, session_id: str):
+    # Recounts one session's comparisons and applies only the difference to the global rollups.
+    # Serialized per session so concurrent resolvers of different days cannot interleave the recount.
+    conn.execute("SELECT pg_advisory_xact_lock(hashtext('comparison_rollups:' || %s))", (session_id,))
+    old = {
+        (r["version_id"], r["rule_id"], r["stakeholder_id"], r["outcome"]): r["count"]
+        for r in conn.execute(
+            "SELECT version_id, rule_id, stakeholder_id, outcome, count FROM session_comparison_rollups WHERE session_id = %s",
+            (session_id,),
+        ).fetchall()
+    }
+    new = {
+        (r["version_id"], r["rule_id"], r["stakeholder_id"], r["outcome"]): r["count"]
+        for r in conn.execute(
+            f"{SESSION_ROLLUP_SELECT} WHERE c.session_id = %s GROUP BY 1, 2, 3, 4, 5",
+            (session_id,),
+        ).fetchall()
+    }
+    if old == new:
+        return
+    delta = Counter(new)
+    delta.subtract(old)
+    conn.execute("DELETE FROM session_comparison_rollups WHERE session_id = %s", (session_id,))
+    _copy_rows(conn, "session_comparison_rollups", SESSION_ROLLUP_COLUMNS, [(session_id, *key, count) for key, count in new.items()])
+    # Global rows are updated in key order so concurrent sessions cannot deadlock on them
+    _execute_batch(conn, COMPARISON_ROLLUP_UPSERT, [(*key, count) for key, count in sorted(delta.items()) if count])
+
+
+DAILY_STATE_COLUMNS = ("session_id", "day", "global_state", "stakeholder_state")
+
+
+def _add_deltas(state: dict, deltas):
+    # Deltas come from the client: anything but an object of numbers is ignored
+    if not isinstance(deltas, dict):
+        return
+    for key, value in deltas.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            state[key] = state.get(key, 0) + value
+
+
+def _refresh_daily_state(conn, session_id: str, from_day: int | None = None):
+    # Rebuilds cumulative snapshots for days >= from_day (all days when None), starting from the
+    # snapshot just before it. Resolving the next day in sequence therefore writes a single row.
+    conn.execute("SELECT pg_advisory_xact_lock(hashtext('daily_state:' || %s))", (session_id,))
+    global_state = {}
+    stakeholder_state = {}
+    day_filter = ""
+    params = [session_id]
+    if from_day is not None:
+        day_filter = " AND day >= %s"
+        params.append(from_day)
+        base = conn.execute(
+            """
+            SELECT global_state, stakeholder_state FROM daily_state_snapshots
+            WHERE session_id = %s AND day < %s
+            ORDER BY day DESC LIMIT 1
+            """,
+            (session_id, from_day),
+        ).fetchone()
+        if base:
+            global_state = dict(base["global_state"])
+            stakeholder_state = {sid: dict(values) for sid, values in base["stakeholder_state"].items()}
+
+    rows = conn.execute(
+        f"SELECT day, global_deltas, stakeholder_deltas FROM daily_effects WHERE session_id = %s{day_filter} ORDER BY day",
+        params,
+    ).fetchall()
+    snapshots = []
+    for row in rows:
+        _add_deltas(global_state, _json_load(row["global_deltas"]))
+        for sid, deltas in _json_dict(row["stakeholder_deltas"]).items():
+            if isinstance(deltas, dict):
+                _add_deltas(stakeholder_state.setdefault(sid, {}), deltas)
+        snapshots.append((session_id, row["day"], _json_dump(global_state), _json_dump(stakeholder_state)))
+    conn.execute(f"DELETE FROM daily_state_snapshots WHERE session_id = %s{day_filter}", params)
+    _copy_rows(conn, "daily_state_snapshots", DAILY_STATE_COLUMNS, snapshots)
+
+
+def _expected_day_index(action: dict):
+    constraints = action.get("constraints") or {}
+    if not isinstance(constraints, dict):
+        return None
+    return _day_index_from_value(constraints.get("day"))
+
+
+def _expected_action_row(session_id: str, action: dict):
+    source = action.get("source", {}) or {}
+    return (
+        action.get("expected_action_id"),
+        session_id,
+        source.get("node_id"),
+        source.get("option_id"),
+        action.get("action_type"),
+        action.get("target_ref"),
+        _json_dump(action.get("constraints")),
+        action.get("rule_id"),
+        action.get("created_at"),
+        action.get("mechanic_id"),
+        _json_dump(action.get("effects")),
+        _expected_day_index(action),
+    )
+
+
+def _canonical_action_row(session_id: str, action: dict):
+    return (
+        action.get("canonical_action_id"),
+        session_id,
+        action.get("mechanic_id"),
+        action.get("action_type"),
+        action.get("target_ref"),
+        _json_dump(action.get("value_final")),
+        action.get("committed_at"),
+        _json_dump(action.get("context")),
+        *_extract_actual_time_info(action),
+    )
+
+
+def normalize_session(conn, session_id: str, session: dict, created_at: str, incremental: bool = False, raw_payload: str | None = None):
+    # raw_payload: the request body session was parsed from; stored as-is when the metadata needs no patching
     metadata = session.get("session_metadata", {})
     comparison_mode = session.get("comparison_mode", "backend")
     version_id = metadata.get("simulator_version_id")
     user_id = _resolve_anonymous_user_id(session_id, metadata.get("user_id"))
     start_time = metadata.get("start_time")
     end_time = metadata.get("end_time")
-    sanitized_session = deepcopy(session)
-    sanitized_metadata = sanitized_session.setdefault("session_metadata", {})
-    sanitized_metadata["session_id"] = session_id
-    sanitized_metadata["user_id"] = user_id
-    payload = json.dumps(sanitized_session, ensure_ascii=False)
+    if raw_payload is not None and "session_metadata" in session and metadata.get("session_id") == session_id and metadata.get("user_id") == user_id:
+        payload = _strip_json_nul(raw_payload)
+    else:
+        # Shallow patch: only the metadata dict is copied, the rest of the document is shared
+        payload = _json_dumps_fast({**session, "session_metadata": {**metadata, "session_id": session_id, "user_id": user_id}})
 
     explicit_decisions = session.get("explicit_decisions", [])
     expected_actions = session.get("expected_actions", [])
@@ -717,267 +2005,152 @@ def normalize_session(conn, session_id: str, session: dict, created_at: str):
             (version_id, created_at),
         )
 
-    for mechanic_id in mechanic_ids:
-        conn.execute(
-            "INSERT INTO mechanics (mechanic_id, version_id) VALUES (%s, %s) ON CONFLICT (mechanic_id) DO NOTHING",
-            (mechanic_id, version_id),
-        )
+    _execute_batch(
+        conn,
+        "INSERT INTO mechanics (mechanic_id, version_id) VALUES (%s, %s) ON CONFLICT (mechanic_id) DO NOTHING",
+        [(mechanic_id, version_id) for mechanic_id in sorted(mechanic_ids)],
+    )
 
     conn.execute(
         """
-        INSERT INTO sessions (session_id, user_id, version_id, start_time, end_time, created_at, payload)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        INSERT INTO sessions (session_id, user_id, version_id, comparison_mode, start_time, end_time, created_at, payload, payload_codec, payload_blob, payload_dict_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         ON CONFLICT (session_id) DO UPDATE SET
             user_id = EXCLUDED.user_id,
             version_id = EXCLUDED.version_id,
+            comparison_mode = EXCLUDED.comparison_mode,
             start_time = EXCLUDED.start_time,
             end_time = EXCLUDED.end_time,
             created_at = EXCLUDED.created_at,
-            payload = EXCLUDED.payload
+            payload = EXCLUDED.payload,
+            payload_codec = EXCLUDED.payload_codec,
+            payload_blob = EXCLUDED.payload_blob,
+            payload_dict_id = EXCLUDED.payload_dict_id,
+            revision = nextval('session_revision_seq')
         """,
-        (session_id, user_id, version_id, start_time, end_time, created_at, payload),
+        (session_id, user_id, version_id, comparison_mode, start_time, end_time, created_at, *_encode_session_payload(conn, payload)),
     )
-
-    conn.execute("DELETE FROM comparisons WHERE session_id = %s", (session_id,))
-    conn.execute("DELETE FROM daily_effects WHERE session_id = %s", (session_id,))
-    conn.execute("DELETE FROM mechanic_events WHERE session_id = %s", (session_id,))
-    conn.execute("DELETE FROM canonical_actions WHERE session_id = %s", (session_id,))
-    conn.execute("DELETE FROM explicit_decisions WHERE session_id = %s", (session_id,))
-    conn.execute("DELETE FROM process_logs WHERE session_id = %s", (session_id,))
-    conn.execute("DELETE FROM player_actions_log WHERE session_id = %s", (session_id,))
-    conn.execute("DELETE FROM session_state WHERE session_id = %s", (session_id,))
-    conn.execute("DELETE FROM session_stakeholders WHERE session_id = %s", (session_id,))
-
-    for decision in explicit_decisions:
-        conn.execute(
-            """
-            INSERT INTO explicit_decisions (session_id, node_id, option_id, option_text, stakeholder, day, time_slot, consequences)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """,
-            (
-                session_id,
-                decision.get("nodeId"),
-                decision.get("choiceId"),
-                decision.get("choiceText"),
-                decision.get("stakeholder"),
-                decision.get("day"),
-                decision.get("timeSlot"),
-                _json_dump(decision.get("consequences")),
-            ),
-        )
-
-    expected_ids = set()
-    for action in expected_actions:
-        source = action.get("source", {})
-        if action.get("expected_action_id"):
-            expected_ids.add(action.get("expected_action_id"))
-        conn.execute(
-            """
-            INSERT INTO expected_actions (expected_action_id, session_id, source_node_id, source_option_id, action_type, target_ref, constraints, rule_id, created_at, mechanic_id, effects)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (expected_action_id) DO UPDATE SET
-                session_id = EXCLUDED.session_id,
-                source_node_id = EXCLUDED.source_node_id,
-                source_option_id = EXCLUDED.source_option_id,
-                action_type = EXCLUDED.action_type,
-                target_ref = EXCLUDED.target_ref,
-                constraints = EXCLUDED.constraints,
-                rule_id = EXCLUDED.rule_id,
-                created_at = EXCLUDED.created_at,
-                mechanic_id = EXCLUDED.mechanic_id,
-                effects = EXCLUDED.effects
-            """,
-            (
-                action.get("expected_action_id"),
-                session_id,
-                source.get("node_id"),
-                source.get("option_id"),
-                action.get("action_type"),
-                action.get("target_ref"),
-                _json_dump(action.get("constraints")),
-                action.get("rule_id"),
-                action.get("created_at"),
-                action.get("mechanic_id"),
-                _json_dump(action.get("effects")),
-            ),
+    # The payload and logs are written to the hot tables again. Archive files no session points to
+    # any more are removed by the next archive_sessions.py run (only after this commits is it safe).
+    conn.execute("DELETE FROM archived_sessions WHERE session_id = %s", (session_id,))
+    response_cache.invalidate(session_id)
+
+    sync_state = _load_sync_state(conn, session_id) if incremental else {}
+
+    def sync(table: str, rows: list):
+        return _sync_table(conn, session_id, table, rows, sync_state, incremental)
+
+    sync("explicit_decisions", [
+        (
+            session_id,
+            decision.get("nodeId"),
+            decision.get("choiceId"),
+            decision.get("choiceText"),
+            decision.get("stakeholder"),
+            decision.get("day"),
+            decision.get("timeSlot"),
+            _json_dump(decision.get("consequences")),
         )
-
-    canonical_ids = set()
-    for action in canonical_actions:
-        canonical_action_id = action.get("canonical_action_id")
-        if canonical_action_id:
-            canonical_ids.add(canonical_action_id)
-        conn.execute(
-            """
-            INSERT INTO canonical_actions (canonical_action_id, session_id, mechanic_id, action_type, target_ref, value_final, committed_at, context)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (canonical_action_id) DO UPDATE SET
-                session_id = EXCLUDED.session_id,
-                mechanic_id = EXCLUDED.mechanic_id,
-                action_type = EXCLUDED.action_type,
-                target_ref = EXCLUDED.target_ref,
-                value_final = EXCLUDED.value_final,
-                committed_at = EXCLUDED.committed_at,
-                context = EXCLUDED.context
-            """,
-            (
-                canonical_action_id,
-                session_id,
-                action.get("mechanic_id"),
-                action.get("action_type"),
-                action.get("target_ref"),
-                _json_dump(action.get("value_final")),
-                action.get("committed_at"),
-                _json_dump(action.get("context")),
-            ),
-        )
-
-    for event in mechanic_events:
-        conn.execute(
-            """
-            INSERT INTO mechanic_events (event_id, session_id, mechanic_id, event_type, timestamp, payload)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            ON CONFLICT (event_id) DO UPDATE SET
-                session_id = EXCLUDED.session_id,
-                mechanic_id = EXCLUDED.mechanic_id,
-                event_type = EXCLUDED.event_type,
-                timestamp = EXCLUDED.timestamp,
-                payload = EXCLUDED.payload
-            """,
-            (
-                event.get("event_id"),
-                session_id,
-                event.get("mechanic_id"),
-                event.get("event_type"),
-                event.get("timestamp"),
-                _json_dump(event.get("payload")),
-            ),
+        for decision in explicit_decisions
+    ])
+
+    expected_ids = {action.get("expected_action_id") for action in expected_actions if action.get("expected_action_id")}
+    sync("expected_actions", [_expected_action_row(session_id, action) for action in expected_actions])
+
+    canonical_ids = {action.get("canonical_action_id") for action in canonical_actions if action.get("canonical_action_id")}
+    sync("canonical_actions", [_canonical_action_row(session_id, action) for action in canonical_actions])
+
+    sync("mechanic_events", [
+        (
+            event.get("event_id"),
+            session_id,
+            event.get("mechanic_id"),
+            event.get("event_type"),
+            event.get("timestamp"),
+            _json_dump(event.get("payload")),
         )
+        for event in mechanic_events
+    ])
 
+    comparison_rows = []
     for comparison in comparisons:
         exp_id = comparison.get("expected_action_id")
-        safe_expected_id = exp_id if exp_id in expected_ids else None
         canonical_id = comparison.get("canonical_action_id")
-        safe_canonical_id = canonical_id if canonical_id in canonical_ids else None
-        conn.execute(
-            """
-            INSERT INTO comparisons (session_id, expected_action_id, canonical_action_id, outcome, deviation, rule_id)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """,
-            (
-                session_id,
-                safe_expected_id,
-                safe_canonical_id,
-                comparison.get("outcome"),
-                _json_dump(comparison.get("deviation")),
-                comparison.get("rule_id"),
-            ),
-        )
-
+        comparison_rows.append((
+            session_id,
+            exp_id if exp_id in expected_ids else None,
+            canonical_id if canonical_id in canonical_ids else None,
+            comparison.get("outcome"),
+            _json_dump(comparison.get("deviation")),
+            comparison.get("rule_id"),
+        ))
+    sync("comparisons", comparison_rows)
+
+    daily_effect_rows = []
     for resolution in daily_resolutions:
         resolution_day = resolution.get("day")
         if resolution_day is None:
             continue
         resolution_created_at = resolution.get("created_at") or created_at
         resolution_status = resolution.get("status") or ("frontend_applied" if comparison_mode == "frontend" else "applied")
-        conn.execute(
-            """
-            INSERT INTO daily_effects (session_id, day, comparisons, global_deltas, stakeholder_deltas, created_at, status, applied_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (session_id, day) DO UPDATE SET
-                comparisons = EXCLUDED.comparisons,
-                global_deltas = EXCLUDED.global_deltas,
-                stakeholder_deltas = EXCLUDED.stakeholder_deltas,
-                created_at = EXCLUDED.created_at,
-                status = EXCLUDED.status,
-                applied_at = EXCLUDED.applied_at
-            """,
-            (
-                session_id,
-                resolution_day,
-                _json_dump(resolution.get("comparisons")),
-                _json_dump(resolution.get("global_deltas")),
-                _json_dump(resolution.get("stakeholder_deltas")),
-                resolution_created_at,
-                resolution_status,
-                resolution_created_at,
-            ),
-        )
-
-    for log in process_log:
-        conn.execute(
-            """
-            INSERT INTO process_logs (session_id, node_id, start_time, end_time, total_duration, final_choice, events)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """,
-            (
-                session_id,
-                log.get("nodeId"),
-                log.get("startTime"),
-                log.get("endTime"),
-                log.get("totalDuration"),
-                log.get("finalChoice"),
-                _json_dump(log.get("events")),
-            ),
+        daily_effect_rows.append((
+            session_id,
+            resolution_day,
+            _json_dump(resolution.get("comparisons")),
+            _json_dump(resolution.get("global_deltas")),
+            _json_dump(resolution.get("stakeholder_deltas")),
+            resolution_created_at,
+            resolution_status,
+            resolution_created_at,
+        ))
+    daily_effects_changed = sync("daily_effects", daily_effect_rows)
+
+    sync("process_logs", [
+        (
+            session_id,
+            log.get("nodeId"),
+            log.get("startTime"),
+            log.get("endTime"),
+            log.get("totalDuration"),
+            log.get("finalChoice"),
+            _json_dump(log.get("events")),
         )
-
-    for log in player_actions_log:
-        conn.execute(
-            """
-            INSERT INTO player_actions_log (session_id, event, metadata, day, time_slot, timestamp)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """,
-            (
-                session_id,
-                log.get("event"),
-                _json_dump(log.get("metadata")),
-                log.get("day"),
-                log.get("timeSlot"),
-                log.get("timestamp"),
-            ),
+        for log in process_log
+    ])
+
+    sync("player_actions_log", [
+        (
+            session_id,
+            log.get("event"),
+            _json_dump(log.get("metadata")),
+            log.get("day"),
+            log.get("timeSlot"),
+            log.get("timestamp"),
         )
+        for log in player_actions_log
+    ])
 
+    state_rows = []
     if final_state:
-        conn.execute(
-            """
-            INSERT INTO session_state (session_id, stakeholders, global_state)
-            VALUES (%s, %s, %s)
-            ON CONFLICT (session_id) DO UPDATE SET
-                stakeholders = EXCLUDED.stakeholders,
-                global_state = EXCLUDED.global_state
-            """,
-            (
-                session_id,
-                _json_dump(final_state.get("stakeholders")),
-                _json_dump(final_state.get("global")),
-            ),
-        )
+        state_rows.append((
+            session_id,
+            _json_dump(final_state.get("stakeholders")),
+            _json_dump(final_state.get("global")),
+        ))
+    sync("session_state", state_rows)
+
+    stakeholder_rows = []
+    session_stakeholder_rows = []
+    question_rows = []
+    # Keyed by question id so a repeated question keeps only its last requirements row
+    requirement_rows = {}
     if isinstance(stakeholders_state, list):
         for stakeholder in stakeholders_state:
             stakeholder_id = stakeholder.get("id") or stakeholder.get("shortId") or stakeholder.get("name")
             if not stakeholder_id:
                 continue
-            conn.execute(
-                "INSERT INTO stakeholders (stakeholder_id, name, role) VALUES (%s, %s, %s) ON CONFLICT (stakeholder_id) DO NOTHING",
-                (
-                    stakeholder_id,
-                    stakeholder.get("name"),
-                    stakeholder.get("role"),
-                ),
-            )
-            conn.execute(
-                """
-                INSERT INTO session_stakeholders (session_id, stakeholder_id, state)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (session_id, stakeholder_id) DO UPDATE SET
-                    state = EXCLUDED.state
-                """,
-                (
-                    session_id,
-                    stakeholder_id,
-                    _json_dump(stakeholder),
-                ),
-            )
+            stakeholder_rows.append((stakeholder_id, stakeholder.get("name"), stakeholder.get("role")))
+            session_stakeholder_rows.append((session_id, stakeholder_id, _json_dump(stakeholder)))
             # Persist question definitions for this stakeholder
             questions = stakeholder.get("questions") or []
             if isinstance(questions, list):
@@ -985,42 +2158,40 @@ def normalize_session(conn, session_id: str, session: dict, created_at: str):
                     q_id = q.get("question_id")
                     if not q_id:
                         continue
-                    conn.execute(
-                        """
-                        INSERT INTO questions (pregunta_id, stakeholder_id, texto_pregunta, texto_respuesta, atributo_global_min, acciones_requeridas)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (pregunta_id) DO UPDATE SET
-                            stakeholder_id = EXCLUDED.stakeholder_id,
-                            texto_pregunta = EXCLUDED.texto_pregunta,
-                            texto_respuesta = EXCLUDED.texto_respuesta,
-                            atributo_global_min = EXCLUDED.atributo_global_min,
-                            acciones_requeridas = EXCLUDED.acciones_requeridas
-                        """,
-                        (
-                            q_id,
-                            stakeholder_id,
-                            q.get("text"),
-                            q.get("answer"),
-                            _json_dump(q.get("requirements")),
-                            _json_dump(q.get("actions_required")),
-                        ),
-                    )
-                    # reset requirements entries for this question to avoid duplicates
-                    conn.execute("DELETE FROM question_requirements WHERE pregunta_id = %s", (q_id,))
+                    question_rows.append((
+                        q_id,
+                        stakeholder_id,
+                        q.get("text"),
+                        q.get("answer"),
+                        _json_dump(q.get("requirements")),
+                        _json_dump(q.get("actions_required")),
+                    ))
                     req = q.get("requirements") or {}
-                    if req:
-                        conn.execute(
-                            """
-                            INSERT INTO question_requirements (pregunta_id, trust_min, support_min, reputation_min)
-                            VALUES (%s, %s, %s, %s)
-                            """,
-                            (
-                                q_id,
-                                req.get("trust_min"),
-                                req.get("support_min"),
-                                req.get("reputation_min"),
-                            ),
-                        )
+                    requirement_rows[q_id] = (
+                        (q_id, req.get("trust_min"), req.get("support_min"), req.get("reputation_min")) if req else None
+                    )
+    # Shared catalogs are written in key order so concurrent rebuild workers lock rows consistently
+    _execute_batch(
+        conn,
+        "INSERT INTO stakeholders (stakeholder_id, name, role) VALUES (%s, %s, %s) ON CONFLICT (stakeholder_id) DO NOTHING",
+        sorted(stakeholder_rows, key=lambda row: row[0]),
+    )
+    # Question definitions derive from the same stakeholder state; skip them when it is unchanged
+    if sync("session_stakeholders", session_stakeholder_rows):
+        _execute_batch(conn, QUESTION_UPSERT, sorted(question_rows, key=lambda row: row[0]))
+        if requirement_rows:
+            # reset requirements entries for these questions to avoid duplicates
+            conn.execute("DELETE FROM question_requirements WHERE pregunta_id = ANY(%s)", (sorted(requirement_rows),))
+            _copy_rows(
+                conn,
+                "question_requirements",
+                QUESTION_REQUIREMENT_COLUMNS,
+                [row for row in requirement_rows.values() if row],
+            )
+
+    _refresh_comparison_rollups(conn, session_id)
+    if daily_effects_changed:
+        _refresh_daily_state(conn, session_id)
 
     return {
         "explicit_decisions": len(explicit_decisions),
@@ -1034,34 +2205,298 @@ def normalize_session(conn, session_id: str, session: dict, created_at: str):
     }
 
 
-@app.post("/sessions")
-def create_session(session: dict = Body(...)):
-    metadata = session.get("session_metadata", {})
-    session_id = metadata.get("session_id")
+NORMALIZE_CHUNK_SIZE = int(os.getenv("NORMALIZE_CHUNK_SIZE", "100"))
+# Payloads are large, so the server-side cursor pulls only a few rows per round trip
+NORMALIZE_FETCH_SIZE = int(os.getenv("NORMALIZE_FETCH_SIZE", "10"))
+
+
+# Stable bucket of a session for partitioned runs (first 28 bits of md5, so it never goes negative)
+SESSION_PARTITION_SQL = "mod(('x' || substr(md5(session_id), 1, 7))::bit(28)::int, %(partition_count)s) = %(partition_index)s"
+# Bulk runs leave archived sessions cold; naming one session re-normalizes it (and makes it hot)
+NORMALIZE_ARCHIVED_SQL = "(%(session_id)s::text IS NOT NULL OR payload_codec IS DISTINCT FROM 'archive')"
+
+
+class UnknownRunError(LookupError):
+    pass
+
+
+def normalize_sessions_stream(conn, run_id=None, chunk_size=None, session_id=None, on_progress=None, partition=None, create_run=False):
+    # Re-normalize stored sessions in session_id order, committing every chunk together with its
+    # checkpoint in normalization_runs; passing the run_id of an interrupted run resumes after it.
+    # An unknown run_id is an error unless create_run (new runs under a caller-chosen id).
+    # partition=(index, count) restricts the run to one deterministic slice of the sessions.
+    chunk_size = max(1, chunk_size or NORMALIZE_CHUNK_SIZE)
+    run = None
+    if run_id:
+        run = conn.execute("SELECT * FROM normalization_runs WHERE run_id = %s", (run_id,)).fetchone()
+        if run is None and not create_run:
+            raise UnknownRunError(run_id)
+    else:
+        run_id = str(uuid4())
+
+    if run is not None:
+        session_id = run["session_id"]
+        if run["partition_count"]:
+            partition = (run["partition_index"], run["partition_count"])
+    partition_index, partition_count = partition or (0, 1)
+    params = {"session_id": session_id, "partition_index": partition_index, "partition_count": partition_count}
+
+    if run is None:
+        total = conn.execute(
+            f"""
+            SELECT count(*) AS total FROM sessions
+            WHERE (%(session_id)s::text IS NULL OR session_id = %(session_id)s) AND {SESSION_PARTITION_SQL}
+              AND {NORMALIZE_ARCHIVED_SQL}
+            """,
+            params,
+        ).fetchone()["total"]
+        now = datetime.now(timezone.utc).isoformat()
+        conn.execute(
+            """
+            INSERT INTO normalization_runs (run_id, status, session_id, processed, total, chunk_size, partition_index, partition_count, started_at, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            (run_id, "running", session_id, 0, total, chunk_size, partition_index, partition_count, now, now),
+        )
+        conn.commit()
+        last_session_id, processed = None, 0
+    else:
+        last_session_id, processed, total = run["last_session_id"], run["processed"], run["total"]
+
+    results = []
+    status = run["status"] if run else "running"
+    while status != "completed":
+        chunk_count = 0
+        try:
+            with conn.cursor(name=f"normalize_{uuid4().hex}") as cur:
+                cur.itersize = NORMALIZE_FETCH_SIZE
+                cur.execute(
+                    f"""
+                    SELECT session_id, {SESSION_PAYLOAD_COLUMNS}, created_at FROM sessions
+                    WHERE (%(last_session_id)s::text IS NULL OR session_id > %(last_session_id)s)
+                      AND (%(session_id)s::text IS NULL OR session_id = %(session_id)s)
+                      AND {SESSION_PARTITION_SQL}
+                      AND {NORMALIZE_ARCHIVED_SQL}
+                    ORDER BY session_id
+                    LIMIT %(chunk_size)s
+                    """,
+                    {**params, "last_session_id": last_session_id, "chunk_size": chunk_size},
+                )
+                for row in cur:
+                    session = _load_session_payload(conn, row)
+                    counts = normalize_session(conn, row["session_id"], session, row["created_at"])
+                    results.append({"session_id": row["session_id"], "counts": counts})
+                    last_session_id = row["session_id"]
+                    chunk_count += 1
+            processed += chunk_count
+            status = "running" if chunk_count == chunk_size else "completed"
+            conn.execute(
+                """
+                UPDATE normalization_runs
+                SET status = %s, last_session_id = %s, processed = %s, updated_at = %s, error = NULL
+                WHERE run_id = %s
+                """,
+                (status, last_session_id, processed, datetime.now(timezone.utc).isoformat(), run_id),
+            )
+            conn.commit()
+        except Exception as exc:
+            conn.rollback()
+            conn.execute(
+                "UPDATE normalization_runs SET status = %s, error = %s, updated_at = %s WHERE run_id = %s",
+                ("failed", str(exc), datetime.now(timezone.utc).isoformat(), run_id),
+            )
+            conn.commit()
+            raise
+        if on_progress and chunk_count:
+            on_progress(processed, total)
+
+    return {"run_id": run_id, "status": status, "processed": processed, "total": total, "results": results}
+
+
+async def _read_session_body(request: Request):
+    # The decoded body is kept so the payload can be stored without re-encoding it; it is the exact
+    # string that gets parsed. UTF-8 only (a leading BOM is dropped). Parsing stays on the stdlib:
+    # orjson would turn integers beyond 64 bits into floats.
+    try:
+        raw = (await request.body()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="body must be UTF-8 encoded JSON")
+    try:
+        session = json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="body must be a JSON object")
+    if not isinstance(session, dict):
+        raise HTTPException(status_code=400, detail="body must be a JSON object")
+    metadata = session.get("session_metadata") or {}
+    session_id = metadata.get("session_id") if isinstance(metadata, dict) else None
     if not session_id:
         raise HTTPException(status_code=400, detail="session_metadata.session_id missing")
+    return raw, session, session_id
 
-    created_at = datetime.now(timezone.utc).isoformat()
 
+def _store_session(session_id: str, session: dict, raw: str):
+    created_at = datetime.now(timezone.utc).isoformat()
     with get_conn() as conn:
         conn.execute("BEGIN")
-        counts = normalize_session(conn, session_id, session, created_at)
+        counts = normalize_session(conn, session_id, session, created_at, incremental=SESSION_SYNC_MODE == "incremental", raw_payload=raw)
         conn.commit()
+    return counts
+
 
+@app.post("/sessions")
+async def create_session(request: Request):
+    raw, session, session_id = await _read_session_body(request)
+    counts = await run_in_threadpool(_store_session, session_id, session, raw)
     return {"ok": True, "session_id": session_id, "counts": counts}
 
 
+# ---- Asynchronous ingestion ----
+# POST /sessions/ingest stores the raw payload as a queued job in one insert and answers 202.
+# INGEST_WORKERS threads per process claim jobs with FOR UPDATE SKIP LOCKED and normalize them in
+# the same transaction that marks the job done, so a crash mid-job leaves it queued for a retry.
+# Jobs of one session run in order: a job is only claimable once no older job of its session is
+# still queued. Failed attempts wait INGEST_RETRY_BACKOFF seconds, doubling per attempt.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_POLL_INTERVAL = float(os.getenv("INGEST_POLL_INTERVAL", "1.0"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_RETRY_BACKOFF = float(os.getenv("INGEST_RETRY_BACKOFF", "5"))
+
+_ingest_stop = threading.Event()
+_ingest_wakeup = threading.Event()
+_ingest_threads: list = []
+
+INGEST_CLAIM_SQL = """
+    SELECT job_id, session_id, body, payload, attempts, created_at
+    FROM ingest_jobs j
+    WHERE status = 'queued'
+      AND (not_before IS NULL OR not_before <= %(now)s)
+      AND NOT EXISTS (
+          SELECT 1 FROM ingest_jobs older
+          WHERE older.session_id = j.session_id
+            AND older.status = 'queued'
+            AND (older.created_at, older.job_id) < (j.created_at, j.job_id)
+      )
+    ORDER BY created_at
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+"""
+
+
+def _process_next_ingest_job():
+    # Returns False when the queue is empty
+    with get_conn() as conn:
+        now = datetime.now(timezone.utc)
+        job = conn.execute(INGEST_CLAIM_SQL, {"now": now.isoformat()}).fetchone()
+        if not job:
+            return False
+        try:
+            with conn.transaction():
+                session = json.loads(job["body"]) if job["body"] is not None else job["payload"]
+                counts = normalize_session(
+                    conn,
+                    job["session_id"],
+                    session,
+                    job["created_at"],
+                    incremental=SESSION_SYNC_MODE == "incremental",
+                    raw_payload=job["body"],
+                )
+        except Exception as exc:
+            attempts = job["attempts"] + 1
+            not_before = now + timedelta(seconds=INGEST_RETRY_BACKOFF * 2 ** (attempts - 1))
+            conn.execute(
+                "UPDATE ingest_jobs SET status = %s, attempts = %s, error = %s, not_before = %s, updated_at = %s WHERE job_id = %s",
+                (
+                    "failed" if attempts >= INGEST_MAX_ATTEMPTS else "queued",
+                    attempts,
+                    f"{type(exc).__name__}: {exc}",
+                    not_before.isoformat(),
+                    datetime.now(timezone.utc).isoformat(),
+                    job["job_id"],
+                ),
+            )
+            return True
+        conn.execute(
+            """
+            UPDATE ingest_jobs
+            SET status = 'done', attempts = attempts + 1, body = NULL, payload = NULL, result = %s, error = NULL, updated_at = %s
+            WHERE job_id = %s
+            """,
+            (_json_dump(counts), datetime.now(timezone.utc).isoformat(), job["job_id"]),
+        )
+    return True
+
+
+def _ingest_worker():
+    while not _ingest_stop.is_set():
+        # Cleared before looking at the queue so an enqueue that races with an empty poll still wakes us
+        _ingest_wakeup.clear()
+        try:
+            if _process_next_ingest_job():
+                continue
+        except Exception:
+            # DB unavailable or similar; back off and keep the worker alive
+            logger.exception("ingest worker error")
+        _ingest_wakeup.wait(INGEST_POLL_INTERVAL)
+
+
+def start_ingest_workers():
+    _ingest_stop.clear()
+    for index in range(INGEST_WORKERS - len(_ingest_threads)):
+        thread = threading.Thread(target=_ingest_worker, name=f"ingest-worker-{index}", daemon=True)
+        thread.start()
+        _ingest_threads.append(thread)
+
+
+def stop_ingest_workers():
+    _ingest_stop.set()
+    _ingest_wakeup.set()
+    for thread in _ingest_threads:
+        thread.join()
+    _ingest_threads.clear()
+
+
+@app.post("/sessions/ingest", status_code=202)
+async def ingest_session(request: Request):
+    raw, _, session_id = await _read_session_body(request)
+
+    job_id = str(uuid4())
+    now = datetime.now(timezone.utc).isoformat()
+    async with get_async_conn() as conn:
+        await conn.execute(
+            """
+            INSERT INTO ingest_jobs (job_id, session_id, body, status, created_at, updated_at)
+            VALUES (%s, %s, %s, 'queued', %s, %s)
+            """,
+            (job_id, session_id, raw, now, now),
+        )
+    _ingest_wakeup.set()
+    return {"ok": True, "job_id": job_id, "session_id": session_id, "status": "queued"}
+
+
+@app.get("/ingest_jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    async with get_async_conn() as conn:
+        cur = await conn.execute(
+            "SELECT job_id, session_id, status, attempts, result, error, not_before, created_at, updated_at FROM ingest_jobs WHERE job_id = %s",
+            (job_id,),
+        )
+        row = await cur.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="ingest job not found")
+    return dict(row)
+
+
 @app.post("/sessions/{session_id}/normalize")
 def normalize_existing_session(session_id: str):
     with get_conn() as conn:
         row = conn.execute(
-            "SELECT payload, created_at FROM sessions WHERE session_id = %s",
+            f"SELECT session_id, {SESSION_PAYLOAD_COLUMNS}, created_at FROM sessions WHERE session_id = %s",
             (session_id,),
         ).fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="session not found")
 
-        session = json.loads(row["payload"])
+        session = _load_session_payload(conn, row)
         conn.execute("BEGIN")
         counts = normalize_session(conn, session_id, session, row["created_at"])
         conn.commit()
@@ -1070,369 +2505,635 @@ def normalize_existing_session(session_id: str):
 
 
 @app.post("/sessions/normalize")
-def normalize_all_sessions():
+def normalize_all_sessions(chunk_size: int = NORMALIZE_CHUNK_SIZE, run_id: str | None = None):
     with get_conn() as conn:
-        rows = conn.execute(
-            "SELECT session_id, payload, created_at FROM sessions"
-        ).fetchall()
-        results = []
-        conn.execute("BEGIN")
-        for row in rows:
-            session = json.loads(row["payload"])
-            counts = normalize_session(conn, row["session_id"], session, row["created_at"])
-            results.append({"session_id": row["session_id"], "counts": counts})
-        conn.commit()
+        try:
+            run = normalize_sessions_stream(conn, run_id=run_id, chunk_size=chunk_size)
+        except UnknownRunError:
+            raise HTTPException(status_code=404, detail="normalization run not found")
+
+    return {
+        "ok": True,
+        "run_id": run["run_id"],
+        "status": run["status"],
+        # Whole run, including chunks committed by earlier calls when resuming
+        "processed": run["processed"],
+        "total": run["total"],
+        "results": run["results"],
+    }
 
-    return {"ok": True, "processed": len(results), "results": results}
 
+@app.get("/normalization_runs/{run_id}")
+async def get_normalization_run(run_id: str):
+    async with get_async_conn() as conn:
+        cur = await conn.execute("SELECT * FROM normalization_runs WHERE run_id = %s", (run_id,))
+        row = await cur.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="normalization run not found")
+    return dict(row)
 
-@app.post("/sessions/{session_id}/resolve_day_effects")
-def resolve_day_effects(session_id: str, day: int, payload: dict | None = Body(default=None)):
-    if day is None:
-        raise HTTPException(status_code=400, detail="day is required")
 
-    with get_conn() as conn:
-        session_row = conn.execute(
-            "SELECT payload FROM sessions WHERE session_id = %s",
-            (session_id,),
-        ).fetchone()
-        if not session_row:
-            raise HTTPException(status_code=404, detail="session not found")
+DAY_EXPECTED_ACTIONS_QUERY = """
+    SELECT expected_action_id, source_node_id, source_option_id, action_type, target_ref,
+           constraints, rule_id, created_at, mechanic_id, effects
+    FROM expected_actions
+    WHERE session_id = %(session_id)s
+      AND (day_index IS NULL OR day_index = ANY(%(day_indexes)s::int[]))
+"""
+
+DAY_CANONICAL_ACTIONS_QUERY = """
+    SELECT c.canonical_action_id, c.mechanic_id, c.action_type, c.target_ref, c.value_final, c.committed_at, c.context,
+           c.weekday_index, c.slot, c.minute_of_day
+    FROM canonical_actions c
+    WHERE c.session_id = %(session_id)s
+      AND EXISTS (
+          SELECT 1 FROM expected_actions e
+          WHERE e.session_id = c.session_id
+            AND (e.day_index IS NULL OR e.day_index = ANY(%(day_indexes)s::int[]))
+            AND e.action_type IS NOT DISTINCT FROM c.action_type
+            AND e.target_ref IS NOT DISTINCT FROM c.target_ref
+      )
+"""
+
+RESOLVE_DAYS_MAX = int(os.getenv("RESOLVE_DAYS_MAX", "366"))
+
+
+def _daily_effect_response(session_id: str, day: int, row):
+    return {
+        "ok": True,
+        "session_id": session_id,
+        "day": day,
+        "comparisons": _json_load(row["comparisons"]) or [],
+        "global_deltas": _json_load(row["global_deltas"]) or {},
+        "stakeholder_deltas": _json_load(row["stakeholder_deltas"]) or {},
+        "cached": True,
+    }
 
-        session_payload = _json_load(session_row.get("payload")) or {}
-        if session_payload.get("comparison_mode") == "frontend":
-            existing_effect = conn.execute(
-                "SELECT comparisons, global_deltas, stakeholder_deltas FROM daily_effects WHERE session_id = %s AND day = %s",
-                (session_id, day),
-            ).fetchone()
-            if existing_effect:
-                return {
-                    "ok": True,
-                    "session_id": session_id,
-                    "day": day,
-                    "comparisons": _json_load(existing_effect["comparisons"]) or [],
-                    "global_deltas": _json_load(existing_effect["global_deltas"]) or {},
-                    "stakeholder_deltas": _json_load(existing_effect["stakeholder_deltas"]) or {},
-                    "cached": True,
-                }
-            return {
+
+def _load_day_candidates(conn, session_id: str, days: list):
+    # Only the candidates for the requested days leave Postgres: expected actions pinned to one of
+    # their weekdays (or to none), and canonical actions that could match one of them on (action_type, target_ref)
+    params = {"session_id": session_id, "day_indexes": sorted({_day_index_from_value(day) for day in days} - {None})}
+    expected_rows = conn.execute(DAY_EXPECTED_ACTIONS_QUERY, params).fetchall()
+    canonical_rows = conn.execute(DAY_CANONICAL_ACTIONS_QUERY, params).fetchall()
+    expected_actions = [
+        {
+            "expected_action_id": r["expected_action_id"],
+            "source": {"node_id": r["source_node_id"], "option_id": r["source_option_id"]},
+            "action_type": r["action_type"],
+            "target_ref": r["target_ref"],
+            "constraints": _json_load(r["constraints"]) or {},
+            "rule_id": r["rule_id"] or "default_rule",
+            "created_at": r["created_at"] or 0,
+            "mechanic_id": r["mechanic_id"],
+            "effects": _json_load(r.get("effects")) or {},
+            "time_constraint": _compile_time_constraint(_json_dict(r["constraints"])),
+        }
+        for r in expected_rows
+    ]
+    canonical_actions = [
+        {
+            "canonical_action_id": r["canonical_action_id"],
+            "mechanic_id": r["mechanic_id"],
+            "action_type": r["action_type"],
+            "target_ref": r["target_ref"],
+            "value_final": _json_load(r["value_final"]),
+            "committed_at": r["committed_at"] or 0,
+            "context": _json_load(r["context"]),
+            "time_info": ActualTime(r["weekday_index"], r["slot"], r["minute_of_day"]),
+        }
+        for r in canonical_rows
+    ]
+    return expected_actions, canonical_actions
+
+
+def _evaluate_day(day: int, expected_actions: list, canonical_index: CanonicalIndex, version_id: str | None = None):
+    # Pure: no DB access. Returns (comparisons, global_deltas, stakeholder_deltas) for one day.
+    day_index = _day_index_from_value(day)
+
+    # SQL already filtered on day_index; this also narrows multi-day loads to the given day
+    def applies_to_day(exp: dict):
+        constraints = exp.get("constraints") or {}
+        if "day" not in constraints:
+            return True
+        exp_day = _day_index_from_value(constraints.get("day"))
+        return exp_day is None or exp_day == day_index
+
+    comparisons = []
+    global_deltas = {"budget": 0, "reputation": 0}
+    stakeholder_deltas = {}
+
+    # Match first, then score every matched pair through the rule registry in one pass
+    candidates = [(exp, canonical_index.best_match(exp)) for exp in expected_actions if applies_to_day(exp)]
+    matched = [(exp, best) for exp, best in candidates if best is not None]
+    outcomes = iter(evaluate_rules(matched, version_id))
+    for exp, best in candidates:
+        outcome = next(outcomes) if best is not None else "FALSE"
+        comparisons.append({
+            "expected_action_id": exp["expected_action_id"],
+            "canonical_action_id": best["canonical_action_id"] if best is not None else None,
+            "outcome": outcome,
+            "deviation": None,
+            "rule_id": exp["rule_id"],
+        })
+        effect = rule_effect(exp, outcome, version_id)
+        _apply_effects(global_deltas, stakeholder_deltas, effect, exp)
+    return comparisons, global_deltas, stakeholder_deltas
+
+
+def _persist_day_effects(conn, session_id: str, day: int, comparisons: list, global_deltas: dict, stakeholder_deltas: dict):
+    _copy_rows(
+        conn,
+        "comparisons",
+        COMPARISON_COLUMNS,
+        [
+            (
+                session_id,
+                cmp["expected_action_id"],
+                cmp["canonical_action_id"],
+                cmp["outcome"],
+                _json_dump(cmp.get("deviation")),
+                cmp.get("rule_id"),
+            )
+            for cmp in comparisons
+        ],
+    )
+    conn.execute(
+        """
+        INSERT INTO daily_effects (session_id, day, comparisons, global_deltas, stakeholder_deltas, created_at, status)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (session_id, day) DO UPDATE SET
+            comparisons = EXCLUDED.comparisons,
+            global_deltas = EXCLUDED.global_deltas,
+            stakeholder_deltas = EXCLUDED.stakeholder_deltas,
+            created_at = EXCLUDED.created_at,
+            status = EXCLUDED.status
+        """,
+        (
+            session_id,
+            day,
+            _json_dump(comparisons),
+            _json_dump(global_deltas),
+            _json_dump(stakeholder_deltas),
+            datetime.now(timezone.utc).isoformat(),
+            "applied",
+        ),
+    )
+
+
+def _resolve_days(conn, session_id: str, days: list, payload: dict | None = None):
+    # Resolves each day in order inside the caller's transaction (the row lock taken here is held
+    # until it commits); one response per day, same shape as resolve_day_effects.
+    # Expected/canonical candidates are loaded and indexed once for all days.
+    # comparison_mode/version_id are promoted columns; the payload blob is never read here.
+    # The sessions row is locked first, as normalize_session does, so both write the child tables
+    # in the same lock order and cannot deadlock each other. It also serializes resolvers of the
+    # session: a concurrent call queues here until the first commits, then sees its daily_effects
+    # rows below and returns them as cached.
+    session_row = conn.execute(
+        "SELECT comparison_mode, version_id FROM sessions WHERE session_id = %s FOR NO KEY UPDATE",
+        (session_id,),
+    ).fetchone()
+    if not session_row:
+        raise HTTPException(status_code=404, detail="session not found")
+
+    version_id = session_row.get("version_id")
+    frontend_mode = session_row.get("comparison_mode") == "frontend"
+    existing = {
+        row["day"]: row
+        for row in conn.execute(
+            "SELECT day, comparisons, global_deltas, stakeholder_deltas FROM daily_effects WHERE session_id = %s AND day = ANY(%s)",
+            (session_id, days),
+        ).fetchall()
+    }
+    if frontend_mode:
+        return [
+            _daily_effect_response(session_id, day, existing[day]) if day in existing else {
                 "ok": False,
                 "reason": "frontend_managed",
                 "message": "daily effects are managed in frontend mode",
                 "session_id": session_id,
                 "day": day,
             }
+            for day in days
+        ]
 
-        existing_effect = conn.execute(
-            "SELECT comparisons, global_deltas, stakeholder_deltas FROM daily_effects WHERE session_id = %s AND day = %s",
-            (session_id, day),
+    pending = [day for day in days if day not in existing]
+    # Optional upsert for expected/canonical provided in payload of the day (only the ones realmente elegidas)
+    if payload and pending:
+        expected_payload = payload.get("expected_actions") or []
+        canonical_payload = payload.get("canonical_actions") or []
+        # Upsert expected first (no deletes), then canonical actions sent for this day
+        _execute_batch(conn, EXPECTED_ACTION_UPSERT, [_with_row_hash(_expected_action_row(session_id, action)) for action in expected_payload])
+        _execute_batch(conn, CANONICAL_ACTION_UPSERT, [_with_row_hash(_canonical_action_row(session_id, action)) for action in canonical_payload])
+        _invalidate_sync_state(conn, session_id, ("expected_actions", "canonical_actions"))
+        _touch_session(conn, session_id)
+
+    resolved = {}
+    if pending:
+        expected_actions, canonical_actions = _load_day_candidates(conn, session_id, pending)
+        has_expected = bool(expected_actions) or conn.execute(
+            "SELECT 1 FROM expected_actions WHERE session_id = %s LIMIT 1",
+            (session_id,),
         ).fetchone()
-        if existing_effect:
-            return {
+        canonical_index = CanonicalIndex(canonical_actions)
+        for day in pending:
+            if not has_expected:
+                resolved[day] = {
+                    "ok": False,
+                    "reason": "missing_expected_actions",
+                    "message": "No expected_actions found in DB for this session. Send session payload before resolving day.",
+                    "session_id": session_id,
+                    "day": day
+                }
+                continue
+            comparisons, global_deltas, stakeholder_deltas = _evaluate_day(day, expected_actions, canonical_index, version_id)
+            if len(comparisons) == 0:
+                resolved[day] = {
+                    "ok": False,
+                    "reason": "missing_expected_actions",
+                    "message": "No valid comparisons to persist because expected_actions are missing.",
+                    "session_id": session_id,
+                    "day": day
+                }
+                continue
+            _persist_day_effects(conn, session_id, day, comparisons, global_deltas, stakeholder_deltas)
+            resolved[day] = {
                 "ok": True,
                 "session_id": session_id,
                 "day": day,
-                "comparisons": _json_load(existing_effect["comparisons"]) or [],
-                "global_deltas": _json_load(existing_effect["global_deltas"]) or {},
-                "stakeholder_deltas": _json_load(existing_effect["stakeholder_deltas"]) or {},
-                "cached": True,
+                "comparisons": comparisons,
+                "global_deltas": global_deltas,
+                "stakeholder_deltas": stakeholder_deltas,
+                "cached": False,
             }
+        if any(result["ok"] for result in resolved.values()):
+            _invalidate_sync_state(conn, session_id, ("comparisons", "daily_effects"))
+            _refresh_comparison_rollups(conn, session_id)
+            _refresh_daily_state(conn, session_id, min(day for day, result in resolved.items() if result["ok"]))
+            _touch_session(conn, session_id)
 
-        # Optional upsert for expected/canonical provided in payload of the day (only the ones realmente elegidas)
-        if payload:
-            expected_payload = payload.get("expected_actions") or []
-            canonical_payload = payload.get("canonical_actions") or []
-            # Upsert expected first (no deletes)
-            for action in expected_payload:
-                source = action.get("source", {}) or {}
-                conn.execute(
-                    """
-                    INSERT INTO expected_actions (expected_action_id, session_id, source_node_id, source_option_id, action_type, target_ref, constraints, rule_id, created_at, mechanic_id, effects)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (expected_action_id) DO UPDATE SET
-                        session_id = EXCLUDED.session_id,
-                        source_node_id = EXCLUDED.source_node_id,
-                        source_option_id = EXCLUDED.source_option_id,
-                        action_type = EXCLUDED.action_type,
-                        target_ref = EXCLUDED.target_ref,
-                        constraints = EXCLUDED.constraints,
-                        rule_id = EXCLUDED.rule_id,
-                        created_at = EXCLUDED.created_at,
-                        mechanic_id = EXCLUDED.mechanic_id,
-                        effects = EXCLUDED.effects
-                    """,
-                    (
-                        action.get("expected_action_id"),
-                        session_id,
-                        source.get("node_id"),
-                        source.get("option_id"),
-                        action.get("action_type"),
-                        action.get("target_ref"),
-                        _json_dump(action.get("constraints")),
-                        action.get("rule_id"),
-                        action.get("created_at"),
-                        action.get("mechanic_id"),
-                        _json_dump(action.get("effects")),
-                    ),
-                )
-            # Upsert canonical actions sent for this day
-            for action in canonical_payload:
-                conn.execute(
-                    """
-                    INSERT INTO canonical_actions (canonical_action_id, session_id, mechanic_id, action_type, target_ref, value_final, committed_at, context)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (canonical_action_id) DO UPDATE SET
-                        session_id = EXCLUDED.session_id,
-                        mechanic_id = EXCLUDED.mechanic_id,
-                        action_type = EXCLUDED.action_type,
-                        target_ref = EXCLUDED.target_ref,
-                        value_final = EXCLUDED.value_final,
-                        committed_at = EXCLUDED.committed_at,
-                        context = EXCLUDED.context
-                    """,
-                    (
-                        action.get("canonical_action_id"),
-                        session_id,
-                        action.get("mechanic_id"),
-                        action.get("action_type"),
-                        action.get("target_ref"),
-                        _json_dump(action.get("value_final")),
-                        action.get("committed_at"),
-                        _json_dump(action.get("context")),
-                    ),
-                )
-            conn.commit()
-
-        expected_rows = conn.execute(
-            """
-            SELECT expected_action_id, source_node_id, source_option_id, action_type, target_ref,
-                   constraints, rule_id, created_at, mechanic_id, effects
-            FROM expected_actions
-            WHERE session_id = %s
-            """,
-            (session_id,),
-        ).fetchall()
-        canonical_rows = conn.execute(
-            """
-            SELECT canonical_action_id, mechanic_id, action_type, target_ref, value_final, committed_at, context
-            FROM canonical_actions
-            WHERE session_id = %s
-            """,
-            (session_id,),
-        ).fetchall()
+    return [_daily_effect_response(session_id, day, existing[day]) if day in existing else resolved[day] for day in days]
 
-        expected_ids = {r["expected_action_id"] for r in expected_rows}
-        if len(expected_ids) == 0:
-            return {
-                "ok": False,
-                "reason": "missing_expected_actions",
-                "message": "No expected_actions found in DB for this session. Send session payload before resolving day.",
-                "session_id": session_id,
-                "day": day
-            }
-
-        expected_actions = [
-            {
-                "expected_action_id": r["expected_action_id"],
-                "source": {"node_id": r["source_node_id"], "option_id": r["source_option_id"]},
-                "action_type": r["action_type"],
-                "target_ref": r["target_ref"],
-                "constraints": _json_load(r["constraints"]) or {},
-                "rule_id": r["rule_id"] or "default_rule",
-                "created_at": r["created_at"] or 0,
-                "mechanic_id": r["mechanic_id"],
-                "effects": _json_load(r.get("effects")) or {},
-            }
-            for r in expected_rows
-        ]
-        canonical_actions = [
-            {
-                "canonical_action_id": r["canonical_action_id"],
-                "mechanic_id": r["mechanic_id"],
-                "action_type": r["action_type"],
-                "target_ref": r["target_ref"],
-                "value_final": _json_load(r["value_final"]),
-                "committed_at": r["committed_at"] or 0,
-                "context": _json_load(r["context"]),
-            }
-            for r in canonical_rows
-        ]
-
-        # Filter expected by day constraint if present
-        day_index = _day_index_from_value(day)
-        def applies_to_day(exp: dict):
-            constraints = exp.get("constraints") or {}
-            if "day" not in constraints:
-                return True
-            exp_day = _day_index_from_value(constraints.get("day"))
-            return exp_day is None or exp_day == day_index
-
-        comparisons = []
-        global_deltas = {"budget": 0, "reputation": 0}
-        stakeholder_deltas = {}
-
-        def resolve_effect(exp: dict, outcome: str):
-            custom = (exp.get("effects") or {}).get(outcome)
-            if custom is not None:
-                return custom
-            return RULE_EFFECTS.get(exp.get("rule_id") or "default_rule", {}).get(outcome)
-
-        for exp in expected_actions:
-            if not applies_to_day(exp):
-                continue
-            matches = [
-                act for act in canonical_actions
-                if act["action_type"] == exp["action_type"]
-                and act["target_ref"] == exp["target_ref"]
-                and (not exp.get("mechanic_id") or act["mechanic_id"] == exp["mechanic_id"])
-            ]
-            if not matches:
-                comparisons.append({
-                    "expected_action_id": exp["expected_action_id"] if exp["expected_action_id"] in expected_ids else None,
-                    "canonical_action_id": None,
-                    "outcome": "FALSE",
-                    "deviation": None,
-                    "rule_id": exp["rule_id"],
-                })
-                effect = resolve_effect(exp, "FALSE")
-                _apply_effects(global_deltas, stakeholder_deltas, effect, exp)
-                continue
 
-            best = _pick_best_match(exp, matches)
-            handler = RULE_HANDLERS.get(exp["rule_id"] or "default_rule", _default_rule)
-            result = handler(exp, best)
-            outcome = "TRUE" if result.get("outcome") == "TRUE" else "FALSE"
-            comparisons.append({
-                "expected_action_id": exp["expected_action_id"] if exp["expected_action_id"] in expected_ids else None,
-                "canonical_action_id": best["canonical_action_id"],
-                "outcome": outcome,
-                "deviation": None,
-                "rule_id": exp["rule_id"],
-            })
-            effect = resolve_effect(exp, outcome)
-            _apply_effects(global_deltas, stakeholder_deltas, effect, exp)
-
-        # Final safety: drop FK values if the referenced id is not present
-        for cmp in comparisons:
-            if cmp.get("expected_action_id") and cmp["expected_action_id"] not in expected_ids:
-                cmp["expected_action_id"] = None
-        comparisons = [c for c in comparisons if (not c.get("expected_action_id")) or c["expected_action_id"] in expected_ids]
-        if len(comparisons) == 0:
-            return {
-                "ok": False,
-                "reason": "missing_expected_actions",
-                "message": "No valid comparisons to persist because expected_actions are missing.",
-                "session_id": session_id,
-                "day": day
-            }
+@app.post("/sessions/{session_id}/resolve_day_effects")
+def resolve_day_effects(session_id: str, day: int, payload: dict | None = Body(default=None)):
+    if day is None:
+        raise HTTPException(status_code=400, detail="day is required")
 
-        created_at = datetime.now(timezone.utc).isoformat()
-        conn.execute("BEGIN")
-        for cmp in comparisons:
-            conn.execute(
-                """
-                INSERT INTO comparisons (session_id, expected_action_id, canonical_action_id, outcome, deviation, rule_id)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    session_id,
-                    cmp["expected_action_id"],
-                    cmp["canonical_action_id"],
-                    cmp["outcome"],
-                    _json_dump(cmp.get("deviation")),
-                    cmp.get("rule_id"),
-                ),
-            )
-        conn.execute(
-            """
-            INSERT INTO daily_effects (session_id, day, comparisons, global_deltas, stakeholder_deltas, created_at, status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (session_id, day) DO UPDATE SET
-                comparisons = EXCLUDED.comparisons,
-                global_deltas = EXCLUDED.global_deltas,
-                stakeholder_deltas = EXCLUDED.stakeholder_deltas,
-                created_at = EXCLUDED.created_at,
-                status = EXCLUDED.status
-            """,
-            (
-                session_id,
-                day,
-                _json_dump(comparisons),
-                _json_dump(global_deltas),
-                _json_dump(stakeholder_deltas),
-                created_at,
-                "applied",
-            ),
-        )
-        conn.commit()
+    with get_conn() as conn:
+        return _resolve_days(conn, session_id, [day], payload)[0]
+
+
+@app.post("/sessions/{session_id}/resolve_days")
+def resolve_days(
+    session_id: str,
+    days: list[int] | None = Query(default=None),
+    start: int | None = None,
+    end: int | None = None,
+    payload: dict | None = Body(default=None),
+):
+    # Either ?days=1&days=3 or an inclusive ?start=1&end=5 range; all days resolve in one transaction
+    if days is None:
+        if start is None or end is None:
+            raise HTTPException(status_code=400, detail="days or start/end is required")
+        if end < start:
+            raise HTTPException(status_code=400, detail="end must be >= start")
+        if end - start + 1 > RESOLVE_DAYS_MAX:
+            raise HTTPException(status_code=400, detail=f"at most {RESOLVE_DAYS_MAX} days per request")
+        days = list(range(start, end + 1))
+    days = list(dict.fromkeys(days))
+    if not days:
+        raise HTTPException(status_code=400, detail="days is required")
+    if len(days) > RESOLVE_DAYS_MAX:
+        raise HTTPException(status_code=400, detail=f"at most {RESOLVE_DAYS_MAX} days per request")
 
-    return {
-        "ok": True,
-        "session_id": session_id,
-        "day": day,
-        "comparisons": comparisons,
-        "global_deltas": global_deltas,
-        "stakeholder_deltas": stakeholder_deltas,
-        "cached": False,
-    }
+    with get_conn() as conn:
+        results = _resolve_days(conn, session_id, days, payload)
+    return {"ok": all(result["ok"] for result in results), "session_id": session_id, "days": results}
 
 
 @app.get("/sessions")
-def list_sessions(limit: int = 100):
-    with get_conn() as conn:
-        rows = conn.execute(
+async def list_sessions(limit: int = 100):
+    async with get_async_conn() as conn:
+        cur = await conn.execute(
             "SELECT session_id, user_id, version_id, start_time, end_time, created_at FROM sessions ORDER BY created_at DESC LIMIT %s",
             (limit,),
-        ).fetchall()
+        )
+        rows = await cur.fetchall()
 
     return [dict(row) for row in rows]
 
 
+async def _session_revision(conn, session_id: str):
+    cur = await conn.execute("SELECT revision FROM sessions WHERE session_id = %s", (session_id,))
+    row = await cur.fetchone()
+    return row["revision"] if row else None
+
+
+RESPONSE_GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+
+
+def _accepts_gzip(accept_encoding: str | None) -> bool:
+    if not accept_encoding:
+        return False
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+async def _cached_session_response(kind: str, session_id: str, if_none_match: str | None, accept_encoding: str | None, load):
+    # Revalidate against the stored revision (one indexed lookup), then answer 304, serve the
+    # cached body, or call load(conn) -> (revision, body bytes) and cache it. Bodies are sent as
+    # stored (already JSON); large ones are gzip-compressed once per revision and cached too.
+    async with get_async_conn() as conn:
+        revision = await _session_revision(conn, session_id)
+        if revision is None:
+            raise HTTPException(status_code=404, detail="session not found")
+        plain_etag, gzip_etag = _etag(kind, revision), _etag(f"{kind}-gzip", revision)
+        if _etag_matches(if_none_match, plain_etag) or _etag_matches(if_none_match, gzip_etag):
+            response_cache.record_not_modified()
+            body = response_cache.peek(kind, session_id, revision)
+            if body is not None:
+                # Same validator a 200 would carry (gzip only for bodies big enough to compress)
+                gzipped = _accepts_gzip(accept_encoding) and len(body) >= RESPONSE_GZIP_MIN_BYTES
+            else:
+                # Body not cached in this process: echo the validator the client holds
+                gzipped = gzip_etag in {c.strip().removeprefix("W/") for c in if_none_match.split(",")}
+            etag = gzip_etag if gzipped else plain_etag
+            return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+        body = response_cache.get(kind, session_id, revision)
+        if body is None:
+            loaded = await load(conn)
+            if loaded is None:
+                raise HTTPException(status_code=404, detail="session not found")
+            revision, body = loaded
+            response_cache.put(kind, session_id, revision, body)
+
+    headers = {"ETag": _etag(kind, revision), "Vary": "Accept-Encoding"}
+    if _accepts_gzip(accept_encoding) and len(body) >= RESPONSE_GZIP_MIN_BYTES:
+        compressed = response_cache.get(f"{kind}-gzip", session_id, revision)
+        if compressed is None:
+            compressed = await run_in_threadpool(gzip.compress, body, RESPONSE_GZIP_LEVEL)
+            response_cache.put(f"{kind}-gzip", session_id, revision, compressed)
+        body = compressed
+        headers["ETag"] = _etag(f"{kind}-gzip", revision)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @app.get("/sessions/{session_id}")
-def get_session(session_id: str):
-    with get_conn() as conn:
-        row = conn.execute(
-            "SELECT payload FROM sessions WHERE session_id = %s",
+async def get_session(
+    session_id: str,
+    if_none_match: str | None = Header(default=None),
+    accept_encoding: str | None = Header(default=None),
+):
+    async def load(conn):
+        cur = await conn.execute(
+            "SELECT revision, payload::text AS payload, payload_codec, payload_blob, payload_dict_id FROM sessions WHERE session_id = %s",
             (session_id,),
-        ).fetchone()
+        )
+        row = await cur.fetchone()
+        if not row:
+            return None
+        if row["payload_codec"] == "zstd":
+            # Compressed rows hold the export's JSON text: decompress and send it as is
+            dictionary = await _payload_dictionary_async(conn, row["payload_dict_id"])
+            return row["revision"], await run_in_threadpool(_decompress_session_payload, row, dictionary)
+        if row["payload_codec"] == "archive":
+            cur = await conn.execute("SELECT month, file_name FROM archived_sessions WHERE session_id = %s", (session_id,))
+            archive = await cur.fetchone()
+            return row["revision"], await run_in_threadpool(_read_archived_payload, archive, session_id)
+        # Postgres renders the stored document as JSON text: send its bytes, no parse/re-encode
+        return row["revision"], row["payload"].encode("utf-8")
+
+    return await _cached_session_response("payload", session_id, if_none_match, accept_encoding, load)
+
+
+# One round trip: the whole normalized view is assembled as JSON inside Postgres.
+# row_hash is bookkeeping for incremental sync, not part of the view.
+NORMALIZED_SESSION_QUERY = """
+    WITH s AS (
+        SELECT session_id, user_id, version_id, start_time, end_time, created_at, revision
+        FROM sessions WHERE session_id = %(session_id)s
+    )
+    SELECT s.revision, json_build_object(
+        'session', to_jsonb(s) - 'revision',
+        'explicit_decisions', COALESCE((SELECT jsonb_agg(to_jsonb(t) - 'row_hash') FROM explicit_decisions t WHERE t.session_id = s.session_id), '[]'::jsonb),
+        'expected_actions', COALESCE((SELECT jsonb_agg(to_jsonb(t) - 'row_hash' - 'day_index') FROM expected_actions t WHERE t.session_id = s.session_id), '[]'::jsonb),
+        'canonical_actions', COALESCE((SELECT jsonb_agg(to_jsonb(t) - 'row_hash' - 'weekday_index' - 'slot' - 'minute_of_day') FROM canonical_actions t WHERE t.session_id = s.session_id), '[]'::jsonb),
+        'mechanic_events', COALESCE((SELECT jsonb_agg(to_jsonb(t) - 'row_hash') FROM mechanic_events t WHERE t.session_id = s.session_id), '[]'::jsonb),
+        'comparisons', COALESCE((SELECT jsonb_agg(to_jsonb(t) - 'row_hash') FROM comparisons t WHERE t.session_id = s.session_id), '[]'::jsonb),
+        'process_logs', COALESCE((SELECT jsonb_agg(to_jsonb(t) - 'row_hash') FROM process_logs t WHERE t.session_id = s.session_id), '[]'::jsonb),
+        'player_actions_log', COALESCE((SELECT jsonb_agg(to_jsonb(t) - 'row_hash') FROM player_actions_log t WHERE t.session_id = s.session_id), '[]'::jsonb),
+        'session_stakeholders', COALESCE((SELECT jsonb_agg(to_jsonb(t) - 'row_hash') FROM session_stakeholders t WHERE t.session_id = s.session_id), '[]'::jsonb),
+        'session_state', (SELECT to_jsonb(t) - 'row_hash' FROM session_state t WHERE t.session_id = s.session_id)
+    )::text AS data, a.month AS archive_month, a.file_name AS archive_file
+    FROM s
+    LEFT JOIN archived_sessions a ON a.session_id = s.session_id
+"""
+
+
+def _normalized_with_archive(data: str, archive, session_id: str) -> bytes:
+    # Archived sessions have no hot log rows: fill those lists from the Parquet files
+    view = json.loads(data)
+    for table in ARCHIVE_TABLES:
+        view[table] = _read_archived_rows(table, archive, session_id)
+    return _json_dumps_fast(view).encode("utf-8")
 
-    if not row:
-        raise HTTPException(status_code=404, detail="session not found")
 
-    return json.loads(row["payload"])
+@app.get("/sessions/{session_id}/normalized")
+async def get_session_normalized(
+    session_id: str,
+    if_none_match: str | None = Header(default=None),
+    accept_encoding: str | None = Header(default=None),
+):
+    async def load(conn):
+        cur = await conn.execute(NORMALIZED_SESSION_QUERY, {"session_id": session_id})
+        row = await cur.fetchone()
+        if row is None:
+            return None
+        if row["archive_file"] is not None:
+            archive = {"month": row["archive_month"], "file_name": row["archive_file"]}
+            return row["revision"], await run_in_threadpool(_normalized_with_archive, row["data"], archive, session_id)
+        # Already serialized by Postgres; pass it through untouched
+        return row["revision"], row["data"].encode("utf-8")
 
+    return await _cached_session_response("normalized", session_id, if_none_match, accept_encoding, load)
 
-@app.get("/sessions/{session_id}/normalized")
-def get_session_normalized(session_id: str):
-    with get_conn() as conn:
-        session_row = conn.execute(
-            "SELECT session_id, user_id, version_id, start_time, end_time, created_at FROM sessions WHERE session_id = %s",
-            (session_id,),
-        ).fetchone()
-        if not session_row:
-            raise HTTPException(status_code=404, detail="session not found")
 
-        data = {"session": dict(session_row)}
-        data["explicit_decisions"] = [dict(r) for r in conn.execute("SELECT * FROM explicit_decisions WHERE session_id = %s", (session_id,)).fetchall()]
-        data["expected_actions"] = [dict(r) for r in conn.execute("SELECT * FROM expected_actions WHERE session_id = %s", (session_id,)).fetchall()]
-        data["canonical_actions"] = [dict(r) for r in conn.execute("SELECT * FROM canonical_actions WHERE session_id = %s", (session_id,)).fetchall()]
-        data["mechanic_events"] = [dict(r) for r in conn.execute("SELECT * FROM mechanic_events WHERE session_id = %s", (session_id,)).fetchall()]
-        data["comparisons"] = [dict(r) for r in conn.execute("SELECT * FROM comparisons WHERE session_id = %s", (session_id,)).fetchall()]
-        data["process_logs"] = [dict(r) for r in conn.execute("SELECT * FROM process_logs WHERE session_id = %s", (session_id,)).fetchall()]
-        data["player_actions_log"] = [dict(r) for r in conn.execute("SELECT * FROM player_actions_log WHERE session_id = %s", (session_id,)).fetchall()]
-        data["session_stakeholders"] = [dict(r) for r in conn.execute("SELECT * FROM session_stakeholders WHERE session_id = %s", (session_id,)).fetchall()]
-        state_row = conn.execute("SELECT * FROM session_state WHERE session_id = %s", (session_id,)).fetchone()
-        data["session_state"] = dict(state_row) if state_row else None
+QUERY_ROW_LIMIT = int(os.getenv("QUERY_ROW_LIMIT", "1000"))
+INTERNAL_COLUMNS = ("row_hash", "day_index", "weekday_index", "slot", "minute_of_day")
+
 
+def _public_row(row):
+    # Internal bookkeeping (incremental sync, day-scoped loading, precompiled rule inputs), not part of the API
+    data = dict(row)
+    for column in INTERNAL_COLUMNS:
+        data.pop(column, None)
     return data
 
 
+def _parse_contains(raw: str | None):
+    if raw is None:
+        return None
+    try:
+        value = json.loads(raw)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="contains must be a JSON object")
+    if not isinstance(value, dict):
+        raise HTTPException(status_code=400, detail="contains must be a JSON object")
+    return _strip_json_nul(json.dumps(value, ensure_ascii=False))
+
+
+async def _query_rows(table: str, filters: list, limit: int, order_by: str):
+    # filters: (sql_fragment, value) pairs; None values are skipped. Everything is evaluated in
+    # Postgres against the JSONB columns and their GIN/expression indexes.
+    clauses = [fragment for fragment, value in filters if value is not None]
+    params = [value for _, value in filters if value is not None]
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    async with get_async_conn() as conn:
+        cur = await conn.execute(
+            f"SELECT * FROM {table} {where} ORDER BY {order_by} LIMIT %s",
+            (*params, max(1, min(limit, QUERY_ROW_LIMIT))),
+        )
+        rows = await cur.fetchall()
+    return [_public_row(r) for r in rows]
+
+
+@app.get("/canonical_actions")
+async def query_canonical_actions(
+    session_id: str | None = None,
+    action_type: str | None = None,
+    mechanic_id: str | None = None,
+    target_ref: str | None = None,
+    day: str | None = None,
+    time_slot: str | None = None,
+    contains: str | None = None,
+    limit: int = 100,
+):
+    return await _query_rows(
+        "canonical_actions",
+        [
+            ("session_id = %s", session_id),
+            ("action_type = %s", action_type),
+            ("mechanic_id = %s", mechanic_id),
+            ("target_ref = %s", target_ref),
+            ("value_final->>'day' = %s", day),
+            ("value_final->>'time_slot' = %s", time_slot),
+            ("value_final @> %s::jsonb", _parse_contains(contains)),
+        ],
+        limit,
+        "session_id, committed_at",
+    )
+
+
+@app.get("/expected_actions")
+async def query_expected_actions(
+    session_id: str | None = None,
+    action_type: str | None = None,
+    rule_id: str | None = None,
+    target_ref: str | None = None,
+    day: str | None = None,
+    time_window: str | None = None,
+    contains: str | None = None,
+    limit: int = 100,
+):
+    return await _query_rows(
+        "expected_actions",
+        [
+            ("session_id = %s", session_id),
+            ("action_type = %s", action_type),
+            ("rule_id = %s", rule_id),
+            ("target_ref = %s", target_ref),
+            ("constraints->>'day' = %s", day),
+            ("constraints->>'time_window' = %s", time_window),
+            ("constraints @> %s::jsonb", _parse_contains(contains)),
+        ],
+        limit,
+        "session_id, created_at",
+    )
+
+
+def _rollup_row(row):
+    # '' is the storage sentinel for a missing dimension
+    return {key: (value if value != "" else None) for key, value in dict(row).items()}
+
+
+@app.get("/rollups/comparisons")
+async def get_comparison_rollups(
+    version_id: str | None = None,
+    rule_id: str | None = None,
+    stakeholder_id: str | None = None,
+):
+    filters = [("version_id", version_id), ("rule_id", rule_id), ("stakeholder_id", stakeholder_id)]
+    # Keys whose sessions were all re-resolved away keep a zero row; they are not reported
+    clauses = ["count <> 0"] + [f"{column} = %s" for column, value in filters if value is not None]
+    params = [value for _, value in filters if value is not None]
+    async with get_async_conn() as conn:
+        cur = await conn.execute(
+            f"SELECT version_id, rule_id, stakeholder_id, outcome, count FROM comparison_rollups WHERE {' AND '.join(clauses)} "
+            "ORDER BY version_id, rule_id, stakeholder_id, outcome",
+            params,
+        )
+        rows = await cur.fetchall()
+    totals = Counter()
+    for row in rows:
+        totals[row["outcome"]] += row["count"]
+    return {"rows": [_rollup_row(r) for r in rows], "totals": dict(totals)}
+
+
+@app.get("/sessions/{session_id}/rollups")
+async def get_session_rollups(session_id: str):
+    async with get_async_conn() as conn:
+        cur = await conn.execute(
+            """
+            SELECT version_id, rule_id, stakeholder_id, outcome, count
+            FROM session_comparison_rollups WHERE session_id = %s
+            ORDER BY rule_id, stakeholder_id, outcome
+            """,
+            (session_id,),
+        )
+        rows = await cur.fetchall()
+    return {"session_id": session_id, "rows": [_rollup_row(r) for r in rows]}
+
+
+@app.get("/sessions/{session_id}/timeline")
+async def get_session_timeline(session_id: str):
+    async with get_async_conn() as conn:
+        cur = await conn.execute(
+            """
+            SELECT s.session_id, t.day, t.global_state, t.stakeholder_state
+            FROM sessions s
+            LEFT JOIN daily_state_snapshots t ON t.session_id = s.session_id
+            WHERE s.session_id = %s
+            ORDER BY t.day
+            """,
+            (session_id,),
+        )
+        rows = await cur.fetchall()
+    if not rows:
+        raise HTTPException(status_code=404, detail="session not found")
+    return {
+        "session_id": session_id,
+        "days": [
+            {"day": r["day"], "global_state": r["global_state"], "stakeholder_state": r["stakeholder_state"]}
+            for r in rows
+            if r["day"] is not None
+        ],
+    }
+
+
 @app.get("/sessions/latest")
-def get_latest_session():
-    with get_conn() as conn:
-        row = conn.execute(
+async def get_latest_session():
+    async with get_async_conn() as conn:
+        cur = await conn.execute(
             "SELECT session_id, user_id, version_id, start_time, end_time, created_at FROM sessions ORDER BY created_at DESC LIMIT 1"
-        ).fetchone()
+        )
+        row = await cur.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="session not found")
 
@@ -1440,11 +3141,12 @@ def get_latest_session():
 
 
 @app.get("/sessions/latest/normalized")
-def get_latest_session_normalized():
-    with get_conn() as conn:
-        row = conn.execute(
+async def get_latest_session_normalized():
+    async with get_async_conn() as conn:
+        cur = await conn.execute(
             "SELECT session_id FROM sessions ORDER BY created_at DESC LIMIT 1"
-        ).fetchone()
+        )
+        row = await cur.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="session not found")
-    return get_session_normalized(row["session_id"])
+    return await get_session_normalized(row["session_id"], if_none_match=None, accept_encoding=None)
@@ -1,42 +1,131 @@
 import argparse
-import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Optional
+from uuid import uuid4
 
-from backend.main import create_schema, get_conn, normalize_session
+from backend.main import UnknownRunError, close_pool, create_schema, get_conn, normalize_sessions_stream
 
 
-def normalize_sessions(session_id: Optional[str]) -> int:
+def _print_progress(processed: int, total: int, label: str = ""):
+    print(f"  {label}{processed}/{total} session(s) normalized", flush=True)
+
+
+def normalize_sessions(session_id: Optional[str], chunk_size: Optional[int] = None, run_id: Optional[str] = None) -> int:
     with get_conn() as conn:
         create_schema(conn)
-        if session_id:
-            rows = conn.execute(
-                "SELECT session_id, payload, created_at FROM sessions WHERE session_id = %s",
-                (session_id,),
-            ).fetchall()
-        else:
-            rows = conn.execute(
-                "SELECT session_id, payload, created_at FROM sessions"
-            ).fetchall()
-
-        if not rows:
-            print("No sessions found to normalize.")
+        try:
+            run = normalize_sessions_stream(
+                conn,
+                run_id=run_id,
+                chunk_size=chunk_size,
+                session_id=session_id,
+                on_progress=_print_progress,
+            )
+        except UnknownRunError:
+            print(f"Cannot resume {run_id}: normalization run not found.")
             return 1
 
-        conn.execute("BEGIN")
-        for row in rows:
-            session = json.loads(row["payload"])
-            normalize_session(conn, row["session_id"], session, row["created_at"])
-        conn.commit()
+    if run["total"] == 0:
+        print("No sessions found to normalize.")
+        return 1
 
-    print(f"Normalized {len(rows)} session(s).")
+    print(f"Normalized {run['processed']} session(s).")
+    if run_id is None:
+        print(f"Run id: {run['run_id']}")
     return 0
 
 
+def _normalize_partition(run_id: str, index: int, workers: int, chunk_size: Optional[int]) -> dict:
+    # Runs in a worker process: its own pool/connection, its own checkpointed run per partition
+    label = f"[worker {index + 1}/{workers}] "
+    partition_run_id = f"{run_id}-w{index}of{workers}"
+    error = None
+    try:
+        with get_conn() as conn:
+            normalize_sessions_stream(
+                conn,
+                run_id=partition_run_id,
+                chunk_size=chunk_size,
+                partition=(index, workers),
+                # Partitions of a new run are created here; on resume a partition that never
+                # started begins from scratch
+                create_run=True,
+                on_progress=lambda processed, total: _print_progress(processed, total, label),
+            )
+    except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"
+    try:
+        # The checkpoint row counts every committed chunk, from earlier runs and before a failure
+        with get_conn() as conn:
+            run = conn.execute(
+                "SELECT processed, total FROM normalization_runs WHERE run_id = %s", (partition_run_id,)
+            ).fetchone()
+        processed, total = (run["processed"], run["total"]) if run else (0, None)
+    except Exception as exc:
+        error = error or f"{type(exc).__name__}: {exc}"
+        processed, total = 0, None
+    finally:
+        close_pool()
+    return {"index": index, "processed": processed, "total": total, "error": error}
+
+
+def normalize_sessions_parallel(workers: int, chunk_size: Optional[int] = None, run_id: Optional[str] = None) -> int:
+    with get_conn() as conn:
+        create_schema(conn)
+        has_sessions = conn.execute("SELECT 1 FROM sessions LIMIT 1").fetchone()
+        resumable = run_id is None or conn.execute(
+            "SELECT 1 FROM normalization_runs WHERE run_id LIKE %s LIMIT 1",
+            (f"{run_id}-w%of{workers}",),
+        ).fetchone()
+    # Workers are spawned fresh; they must not inherit this process' pooled sockets
+    close_pool()
+
+    if not has_sessions:
+        print("No sessions found to normalize.")
+        return 1
+    if not resumable:
+        print(f"Cannot resume {run_id}: no partitioned run with {workers} worker(s) found.")
+        return 1
+
+    base_run_id = run_id or str(uuid4())
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {
+            executor.submit(_normalize_partition, base_run_id, index, workers, chunk_size): index
+            for index in range(workers)
+        }
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as exc:
+                results.append({"index": futures[future], "processed": 0, "total": None, "error": f"{type(exc).__name__}: {exc}"})
+
+    failed = sorted((r for r in results if r["error"]), key=lambda r: r["index"])
+    print(f"Normalized {sum(r['processed'] for r in results)} session(s).")
+    for r in failed:
+        print(f"Worker {r['index'] + 1}/{workers} failed: {r['error']}")
+    if failed or run_id is None:
+        print(f"Run id: {base_run_id}" + (" (use --resume to retry failed partitions)" if failed else ""))
+    return 1 if failed else 0
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Normalize existing sessions in Postgres.")
     parser.add_argument("--session-id", help="Normalize a single session")
+    parser.add_argument("--chunk-size", type=int, help="Sessions committed per transaction")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Resume an interrupted run from its checkpoint")
+    parser.add_argument("--workers", type=int, default=1, help="Normalize in N parallel processes")
     args = parser.parse_args()
-    return normalize_sessions(args.session_id)
+    if args.workers > 1 and args.session_id:
+        parser.error("--workers cannot be combined with --session-id")
+    try:
+        if args.workers > 1:
+            return normalize_sessions_parallel(args.workers, args.chunk_size, args.resume)
+        return normalize_sessions(args.session_id, args.chunk_size, args.resume)
+    finally:
+        close_pool()
 
 
 if __name__ == "__main__":
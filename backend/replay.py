@@ -0,0 +1,174 @@
+import argparse
+import json
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+
+from backend.main import (
+    SESSION_PARTITION_SQL,
+    CanonicalIndex,
+    _evaluate_day,
+    _json_load,
+    _load_day_candidates,
+    close_pool,
+    get_conn,
+    load_rule_plugins,
+)
+
+# Read-only what-if scoring: re-runs matching and rule evaluation over the stored expected/canonical
+# actions of every resolved day and compares the result with what daily_effects holds today.
+# Nothing is written; each worker runs in a single READ ONLY transaction.
+
+
+def _empty_report() -> dict:
+    return {
+        "sessions": 0,
+        "days": 0,
+        "changed_days": 0,
+        "outcomes": {"current": Counter(), "candidate": Counter()},
+        "global_deltas": {"current": Counter(), "candidate": Counter()},
+        "stakeholder_deltas": {"current": Counter(), "candidate": Counter()},
+    }
+
+
+def _merge_report(total: dict, part: dict):
+    for key in ("sessions", "days", "changed_days"):
+        total[key] += part[key]
+    for key in ("outcomes", "global_deltas", "stakeholder_deltas"):
+        for side in ("current", "candidate"):
+            total[key][side].update(part[key][side])
+
+
+def _tally(report: dict, side: str, version_id: Optional[str], comparisons: list, global_deltas: dict, stakeholder_deltas: dict):
+    for cmp in comparisons:
+        report["outcomes"][side][(version_id, cmp.get("rule_id"), cmp.get("outcome"))] += 1
+    report["global_deltas"][side].update(global_deltas)
+    for deltas in stakeholder_deltas.values():
+        report["stakeholder_deltas"][side].update(deltas)
+
+
+def _replay_session(conn, session_id: str, version_id: Optional[str], report: dict):
+    rows = conn.execute(
+        "SELECT day, comparisons, global_deltas, stakeholder_deltas FROM daily_effects WHERE session_id = %s ORDER BY day",
+        (session_id,),
+    ).fetchall()
+    if not rows:
+        return
+    expected_actions, canonical_actions = _load_day_candidates(conn, session_id, [r["day"] for r in rows])
+    canonical_index = CanonicalIndex(canonical_actions)
+    report["sessions"] += 1
+    for row in rows:
+        current = (
+            _json_load(row["comparisons"]) or [],
+            _json_load(row["global_deltas"]) or {},
+            _json_load(row["stakeholder_deltas"]) or {},
+        )
+        candidate = _evaluate_day(row["day"], expected_actions, canonical_index, version_id)
+        _tally(report, "current", version_id, *current)
+        _tally(report, "candidate", version_id, *candidate)
+        report["days"] += 1
+        if [c.get("outcome") for c in current[0]] != [c["outcome"] for c in candidate[0]] or current[1:] != candidate[1:]:
+            report["changed_days"] += 1
+
+
+def _replay_partition(index: int, workers: int, rules: Optional[str], version_id: Optional[str], session_id: Optional[str]) -> dict:
+    # Runs in a worker process: production plugins first, then the candidate rules on top of them
+    report = _empty_report()
+    try:
+        load_rule_plugins()
+        if rules:
+            load_rule_plugins(rules)
+        with get_conn() as conn:
+            conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            sessions = conn.execute(
+                f"""
+                SELECT session_id, version_id FROM sessions
+                WHERE comparison_mode IS DISTINCT FROM 'frontend'
+                  AND (%(version_id)s::text IS NULL OR version_id = %(version_id)s)
+                  AND (%(session_id)s::text IS NULL OR session_id = %(session_id)s)
+                  AND {SESSION_PARTITION_SQL}
+                ORDER BY session_id
+                """,
+                {"version_id": version_id, "session_id": session_id, "partition_index": index, "partition_count": workers},
+            ).fetchall()
+            for row in sessions:
+                _replay_session(conn, row["session_id"], row["version_id"], report)
+            conn.rollback()
+        return {"index": index, "report": report, "error": None}
+    except Exception as exc:
+        return {"index": index, "report": report, "error": f"{type(exc).__name__}: {exc}"}
+    finally:
+        close_pool()
+
+
+def replay(workers: int, rules: Optional[str] = None, version_id: Optional[str] = None, session_id: Optional[str] = None):
+    total = _empty_report()
+    errors = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = [
+            executor.submit(_replay_partition, index, workers, rules, version_id, session_id)
+            for index in range(workers)
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            _merge_report(total, result["report"])
+            if result["error"]:
+                errors.append(f"Worker {result['index'] + 1}/{workers} failed: {result['error']}")
+    return total, errors
+
+
+def _diff_rows(counters: dict):
+    current, candidate = counters["current"], counters["candidate"]
+    # Keys may contain None (sessions without a version), so sort on their string form
+    keys = sorted(set(current) | set(candidate), key=lambda key: str(key))
+    return [(key, current.get(key, 0), candidate.get(key, 0)) for key in keys]
+
+
+def _print_report(report: dict):
+    print(f"Replayed {report['days']} day(s) across {report['sessions']} session(s); {report['changed_days']} day(s) would change.")
+    print("Outcomes (version / rule_id / outcome): current -> candidate")
+    for (version_id, rule_id, outcome), current, candidate in _diff_rows(report["outcomes"]):
+        print(f"  {version_id} / {rule_id} / {outcome}: {current} -> {candidate} ({candidate - current:+d})")
+    for label, key in (("Global deltas", "global_deltas"), ("Stakeholder deltas", "stakeholder_deltas")):
+        print(f"{label}: current -> candidate")
+        for name, current, candidate in _diff_rows(report[key]):
+            print(f"  {name}: {current} -> {candidate} ({candidate - current:+g})")
+
+
+def _report_json(report: dict) -> dict:
+    return {
+        "sessions": report["sessions"],
+        "days": report["days"],
+        "changed_days": report["changed_days"],
+        "outcomes": [
+            {"version_id": version_id, "rule_id": rule_id, "outcome": outcome, "current": current, "candidate": candidate}
+            for (version_id, rule_id, outcome), current, candidate in _diff_rows(report["outcomes"])
+        ],
+        "global_deltas": {name: {"current": current, "candidate": candidate} for name, current, candidate in _diff_rows(report["global_deltas"])},
+        "stakeholder_deltas": {name: {"current": current, "candidate": candidate} for name, current, candidate in _diff_rows(report["stakeholder_deltas"])},
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Re-score stored sessions under a candidate rule set without writing.")
+    parser.add_argument("--rules", help="Comma-separated rule plugin modules to apply on top of the current rules")
+    parser.add_argument("--version-id", help="Only replay sessions of this simulator version")
+    parser.add_argument("--session-id", help="Replay a single session")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Replay in N parallel processes")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+    report, errors = replay(max(1, args.workers), args.rules, args.version_id, args.session_id)
+    if args.json:
+        print(json.dumps({**_report_json(report), "errors": errors}, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+        for error in errors:
+            print(error)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())